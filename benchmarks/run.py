@@ -0,0 +1,109 @@
+"""
+#Func:
+    run pyppe benchmarks offline on synthetic data, record time and peak memory,
+    and flag regressions against a stored baseline
+
+#Usage:
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --save baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.25
+    python -m benchmarks.run --filter rolling
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from .suite import cases
+
+
+# run one case, return best time (seconds) and peak traced memory (bytes)
+def measure(setup, run, params, repeat=3):
+    state = setup(params)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+
+    # memory is traced on a separate run, tracing slows down the timed runs
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+# run all cases, return {case[params]: {"time": seconds, "peak_memory": bytes}}
+def run_all(quick=False, name_filter=None, repeat=3, out=sys.stdout):
+    results = {}
+
+    for name, (grid, setup, run) in sorted(cases(quick).items()):
+        if name_filter and name_filter not in name:
+            continue
+
+        for params in grid:
+            key = name + str(list(params))
+            seconds, peak = measure(setup, run, params, repeat)
+            results[key] = {"time":seconds, "peak_memory":peak}
+            out.write("%-60s %10.4fs %10.1fMB\n" % (key, seconds, peak / 2.0 ** 20))
+            out.flush()
+
+    return results
+
+
+# compare results with a baseline, return regressed keys
+def compare(results, baseline, threshold=0.25, min_time=0.005, out=sys.stdout):
+    regressions = []
+
+    for key, res in sorted(results.items()):
+        if key not in baseline:
+            continue
+
+        base = baseline[key]
+        time_ratio = res["time"] / max(base["time"], 1e-9)
+        memory_ratio = res["peak_memory"] / max(base["peak_memory"], 1.0)
+        # cases faster than min_time are too noisy to flag on time
+        slower = time_ratio > 1 + threshold and res["time"] - base["time"] > min_time
+        flag = slower or memory_ratio > 1 + threshold
+        if flag:
+            regressions.append(key)
+
+        out.write("%-60s time x%5.2f  memory x%5.2f%s\n" %
+                  (key, time_ratio, memory_ratio, "  REGRESSION" if flag else ""))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pyppe benchmarks on synthetic data")
+    parser.add_argument("--quick", action="store_true", help="small sizes only")
+    parser.add_argument("--filter", default=None, help="run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, best is kept")
+    parser.add_argument("--save", default=None, help="save results to a JSON baseline")
+    parser.add_argument("--compare", default=None, help="compare results with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio")
+    parser.add_argument("--min-time", type=float, default=0.005, help="ignore slowdowns below these seconds")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.quick, args.filter, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.min_time):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from pyppe import covariance, models, portfolio, report, rolling, stats, tdays, windapi
+from pyppe.providers import FakeProvider, set_provider
+
+# sizes of synthetic data: trading days, funds, style indices
+days_grid = [250, 2500]
+funds_grid = [1, 500, 5000]
+styles_grid = [2, 6]
+
+# smaller sizes for a quick run
+quick_days_grid = [250]
+quick_funds_grid = [1, 100]
+quick_styles_grid = [2]
+
+
+# return synthetic daily returns of funds driven by style indices
+def synthetic_rets(days, funds, num_style=4, seed=0):
+    """
+    #Func:
+        return synthetic daily returns of funds driven by style indices
+
+    #Params:
+        days: number of trading days
+        funds: number of funds
+        num_style: number of style indices
+        seed: random seed
+
+    #Return:
+        (funds' returns, style indices' returns) in pandas DataFrame
+    """
+
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2010-01-04", periods=days)
+
+    style = rng.normal(0.0003, 0.012, (days, num_style))
+    weights = rng.dirichlet(np.ones(num_style), funds)
+    rets = style.dot(weights.T) + rng.normal(0.0001, 0.004, (days, funds))
+
+    style = pd.DataFrame(style, index=index, columns=["S%d" % i for i in range(num_style)])
+    rets = pd.DataFrame(rets, index=index, columns=["F%05d.OF" % i for i in range(funds)])
+
+    return rets, style
+
+
+# install a stand-in Wind provider serving synthetic NAV with latency per request
+def synthetic_provider(days, funds, latency=0.0, seed=0):
+    rets, _ = synthetic_rets(days, funds, seed=seed)
+    navs = (1 + rets).cumprod()
+
+    provider = FakeProvider({code:navs[[code]].rename(columns={code: "NAV"}) for code in navs.columns},
+                            latency=latency)
+    set_provider(provider)
+    tdays.set_calendar_source(None)
+
+    return provider
+
+
+# benchmark cases: name -> (params grid, setup(params) -> state, run(state))
+def cases(quick=False):
+    days_list = quick_days_grid if quick else days_grid
+    funds_list = quick_funds_grid if quick else funds_grid
+    styles_list = quick_styles_grid if quick else styles_grid
+
+    grid = [(d, n) for d in days_list for n in funds_list]
+    rbsa_grid = [(d, k) for d in days_list for k in styles_list]
+
+    def setup_rets(params):
+        rets, style = synthetic_rets(params[0], params[1])
+        return {"rets":rets, "prices":(1 + rets).cumprod(), "style":style, "benchmark":style.mean(axis=1)}
+
+    def setup_rbsa(params):
+        rets, style = synthetic_rets(params[0], 1, num_style=params[1])
+        return {"rets":rets, "style":style}
+
+    def setup_portfolio(params):
+        rets, _ = synthetic_rets(params[0], 20)
+        weights = np.random.default_rng(0).dirichlet(np.ones(20), params[1])
+        return {"prices":(1 + rets).cumprod(), "weights":weights}
+
+    def setup_fetch(params):
+        synthetic_provider(params[0], params[1], latency=0.002)
+        return {"codes":["F%05d.OF" % i for i in range(params[1])], "days":params[0]}
+
+    def fetch(state, workers):
+        dates = tdays.get_calendar().dates
+        windapi.wind_series(state["codes"], "NAV", dates[0].item(), dates[-1].item(), workers=workers)
+
+    return {
+        "stats.perf_report":(grid, setup_rets, lambda s: report.perf_report(prices=s["prices"])),
+        "stats.cor_matrix":(grid, setup_rets, lambda s: stats.cor_matrix(s["rets"], block_size=1000)),
+        "stats.downside_std":(grid, setup_rets, lambda s: stats.downside_std(s["rets"])),
+        "rolling.annl_std_y":(grid, setup_rets, lambda s: rolling.rolling_annl_std(s["rets"], "y")),
+        "rolling.maxdrawdown_y":(grid, setup_rets, lambda s: rolling.rolling_maxdrawdown(s["prices"], "y")),
+        "models.batch_single_index_model":(grid, setup_rets,
+                                           lambda s: models.batch_single_index_model(s["rets"], s["benchmark"])),
+        "models.batch_market_timing_hac":(grid, setup_rets,
+                                          lambda s: models.batch_market_timing(s["rets"], s["benchmark"],
+                                                                               hac_lags=True)),
+        "models.dynamic_rbsa":(grid, setup_rets, lambda s: models.dynamic_rbsa(s["rets"], s["style"])),
+        "models.trailing_rbsa_m":(rbsa_grid, setup_rbsa, lambda s: models.trailing_rbsa(s["rets"], s["style"], "m")),
+        "portfolio.portfolio_nav_m":(grid, setup_portfolio,
+                                     lambda s: portfolio.portfolio_nav(s["prices"], s["weights"], 21)),
+        "covariance.ledoit_wolf":(grid, setup_rets, lambda s: covariance.ledoit_wolf(s["rets"])),
+        "covariance.ewma_cov":([(d, n) for d in days_list for n in funds_list if n <= 500], setup_rets,
+                               lambda s: covariance.ewma_cov(s["rets"], halflife=60)),
+        "windapi.wind_series":([(d, n) for d in days_list for n in funds_list if n <= 500], setup_fetch,
+                               lambda s: fetch(s, None)),
+        "windapi.wind_series_workers":([(d, n) for d in days_list for n in funds_list if n <= 500], setup_fetch,
+                                       lambda s: fetch(s, 16)),
+    }
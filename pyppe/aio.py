@@ -0,0 +1,208 @@
+import asyncio
+import functools
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import fields_list
+from .tdays import get_calendar, to_date
+from .windapi import wind_series
+
+# client used by module level functions, created on first use
+_client = None
+
+
+# asyncio client of blocking Wind API calls
+class AsyncWind(object):
+    """
+    #Func:
+        asyncio client of blocking Wind API calls, every call runs in a thread pool
+        so the event loop is never blocked,
+        at most [max_concurrency] upstream calls run at a time,
+        identical in-flight requests (same code, fields, dates and options)
+        share one upstream call
+
+        a caller timing out or cancelled stops waiting at once,
+        the shared upstream call goes on for the other callers
+        (a running Wind request cannot be interrupted)
+
+    #Params:
+        max_concurrency: max upstream calls running at a time
+        timeout: default seconds a caller waits, if None, no limit
+        executor: concurrent.futures executor, if None, a thread pool of [max_concurrency]
+    """
+
+    def __init__(self, max_concurrency=8, timeout=None, executor=None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_concurrency)
+        self.upstream_calls = 0
+        self._loop = None
+        self._semaphore = None
+        self._inflight = {}
+
+    # bind semaphore and in-flight requests to the running loop
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._inflight = {}
+
+        return loop
+
+    # run a blocking function in executor, bounded by semaphore
+    async def _run(self, func, *args, **kwargs):
+        async with self._semaphore:
+            self.upstream_calls += 1
+            return await self._loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # drop a finished request from in-flight requests, and mark its error as retrieved
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    # run a blocking call, shared by identical in-flight requests
+    async def call(self, key, func, *args, timeout=None, **kwargs):
+        """
+        #Func:
+            run a blocking call in executor, shared by identical in-flight requests
+
+        #Params:
+            key: hashable identity of the request
+            func: blocking function
+            *args, **kwargs: parameters of func
+            timeout: seconds to wait, if None, the client's default
+
+        #Return:
+            result of func
+        """
+
+        self._bind()
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(func, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+
+        timeout = self.timeout if timeout is None else timeout
+
+        # shield: one caller giving up must not cancel the call shared by others
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    # fetch time series data, see wind_series
+    async def wind_series(self, wcodes, fields, sdate, edate, timeout=None, **kwargs):
+        """
+        #Func:
+            fetch time series data without blocking the event loop, see wind_series,
+            codes are fetched (and shared with other callers) one by one
+
+        #Params:
+            wcodes: Wind code, e.g: "000300.SH", ["000300.SH", "000985.CSI"]
+            fields: data field, e.g: "close", ["high", "low"]
+            sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+            timeout: seconds to wait, if None, the client's default
+            **kwargs: parameters of wind_series, e.g: cache, retries
+
+        #Return:
+            time series data in pandas DataFrame
+            with date index and Wind code + fields columns (hierarchical columns)
+        """
+
+        if isinstance(wcodes, str):
+            wcodes = [wcodes]
+        fields = fields_list(fields)
+        sdate, edate = to_date(sdate), to_date(edate)
+        options = tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+        # load calendar once before codes are fetched concurrently
+        wind_options = {k:v for k, v in kwargs.items() if k not in ("cache", "workers", "rate", "retries", "backoff",
+                                                                 "retry_codes")}
+        await self.calendar(timeout=timeout, **wind_options)
+
+        async def fetch(code):
+            key = ("wind_series", code.upper(), tuple(fields), sdate, edate, options)
+            return await self.call(key, wind_series, code, fields, sdate, edate, **kwargs)
+
+        frames = await asyncio.wait_for(asyncio.gather(*[fetch(code) for code in wcodes]),
+                                        self.timeout if timeout is None else timeout)
+
+        return pd.concat(frames, axis=1)
+
+    # return trading calendar, loaded without blocking the event loop
+    async def calendar(self, timeout=None, **kwargs):
+        key = ("calendar",) + tuple(sorted(kwargs.items()))
+        return await self.call(key, get_calendar, timeout=timeout, **kwargs)
+
+    # return previous(most recent) trading day's date, see tdays_prev
+    async def tdays_prev(self, date=None, **kwargs):
+        return (await self.calendar(**kwargs)).prev(date)
+
+    # return next trading day's date, see tdays_next
+    async def tdays_next(self, date=None, **kwargs):
+        return (await self.calendar(**kwargs)).next(date)
+
+    # return trading day's date from a [offset] of a paticular date, see tdays_offset
+    async def tdays_offset(self, offset, date, **kwargs):
+        return (await self.calendar(**kwargs)).offset(offset, date)
+
+    # return the nearest trading day's date, see tdays_nearest
+    async def tdays_nearest(self, date=None, **kwargs):
+        return (await self.calendar(**kwargs)).nearest(date)
+
+
+# return the client used by module level functions
+def get_client():
+    global _client
+
+    if _client is None:
+        _client = AsyncWind()
+
+    return _client
+
+
+# set the client used by module level functions
+def set_client(client):
+    """
+    #Func:
+        set the client used by module level functions, e.g: AsyncWind(max_concurrency=4, timeout=10)
+
+    #Params:
+        client: AsyncWind, if None, a default one on next use
+    """
+
+    global _client
+
+    _client = client
+
+
+# fetch time series data without blocking the event loop
+async def awind_series(wcodes, fields, sdate, edate, timeout=None, **kwargs):
+    return await get_client().wind_series(wcodes, fields, sdate, edate, timeout=timeout, **kwargs)
+
+
+# return trading calendar without blocking the event loop
+async def aget_calendar(**kwargs):
+    return await get_client().calendar(**kwargs)
+
+
+# return previous(most recent) trading day's date without blocking the event loop
+async def atdays_prev(date=None, **kwargs):
+    return await get_client().tdays_prev(date, **kwargs)
+
+
+# return next trading day's date without blocking the event loop
+async def atdays_next(date=None, **kwargs):
+    return await get_client().tdays_next(date, **kwargs)
+
+
+# return trading day's date from a [offset] of a paticular date without blocking the event loop
+async def atdays_offset(offset, date, **kwargs):
+    return await get_client().tdays_offset(offset, date, **kwargs)
+
+
+# return the nearest trading day's date without blocking the event loop
+async def atdays_nearest(date=None, **kwargs):
+    return await get_client().tdays_nearest(date, **kwargs)
@@ -0,0 +1,173 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from .regression import simple_ols
+from .stats import df_to_series
+
+# data shared with worker processes of bootstrap_alpha
+_shared = {}
+
+
+# t-stats of alpha of every fund in every draw, regressions batched over draws
+def _alpha_tstats(y, x):
+    """
+    #Func:
+        t-stats of alpha of every fund in every draw, y[d, :, j] regressed on x[d, :]
+
+    #Params:
+        y: draws x T x N numpy array, NaN masked
+        x: draws x T numpy array
+
+    #Return:
+        draws x N numpy array
+    """
+
+    mask = np.isfinite(y) & np.isfinite(x)[:, :, None]
+    m = mask.astype(float)
+    x0 = np.where(np.isfinite(x), x, 0.0)[:, None, :]
+    y0 = np.where(mask, y, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = m.sum(axis=1)
+        sx = np.matmul(x0, m)[:, 0]
+        sxx = np.matmul(x0 * x0, m)[:, 0]
+        sy = y0.sum(axis=1)
+        syy = (y0 * y0).sum(axis=1)
+        sxy = np.matmul(x0, y0)[:, 0]
+
+        mx, my = sx / n, sy / n
+        ssx = sxx - n * mx * mx
+        ssy = syy - n * my * my
+        sxy = sxy - n * mx * my
+
+        beta = sxy / ssx
+        alpha = my - beta * mx
+        s2 = np.clip(ssy - beta * sxy, 0, None) / (n - 2)
+        alpha_stderr = np.sqrt(s2 * (1.0 / n + mx * mx / ssx))
+
+    return alpha / alpha_stderr
+
+
+# attach a worker process to the data of bootstrap_alpha
+def _attach(resid, fitted, benchmark, tstats, pcts):
+    _shared.update(resid=resid, fitted=fitted, benchmark=benchmark, tstats=tstats, pcts=pcts)
+
+
+# run a chunk of bootstrap draws, funds regressed in blocks of [cols] columns
+def _draw_chunk(args):
+    seed, size, cols = args
+    resid, fitted, benchmark = _shared["resid"], _shared["fitted"], _shared["benchmark"]
+
+    # resample dates jointly for all funds, keeps cross-sectional correlation
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(benchmark), size=(size, len(benchmark)))
+    x = benchmark[idx]
+
+    # zero alpha returns: beta * benchmark + residual on resampled dates
+    t = np.empty((size, resid.shape[1]))
+    for j in range(0, resid.shape[1], cols):
+        block = slice(j, j + cols)
+        t[:, block] = _alpha_tstats(fitted[:, block][idx] + resid[:, block][idx], x)
+
+    with np.errstate(invalid="ignore"):
+        beats = np.nansum(t >= _shared["tstats"], axis=0) # per fund
+        counts = np.isfinite(t).sum(axis=0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # draws without any t-stat
+        pcts = np.nanpercentile(t, _shared["pcts"], axis=1).T
+
+    return beats, counts, pcts
+
+
+# bootstrap luck versus skill of alpha t-stats across funds
+def bootstrap_alpha(rets, benchmark, n_boot=1000, seed=None, processes=1,
+                    max_bytes=2 ** 28, pcts=(1, 5, 10, 25, 50, 75, 90, 95, 99)):
+    """
+    #Func:
+        bootstrap luck versus skill of alpha t-stats across funds (Kosowski et al. 2006,
+        Fama & French 2010): single index model of every fund, then returns with zero alpha
+        (beta * benchmark + residual) are resampled on jointly drawn dates,
+        and t-stats of alpha of all funds are recalculated in every draw,
+        draws run in chunks of batched index arrays and matrix OLS
+
+    #Params:
+        rets: returns of funds, pandas DataFrame or numpy array (date x fund)
+        benchmark: returns of benchmark aligned with rets,
+                   pandas dataframe (first column), pandas series or numpy array
+        n_boot: number of bootstrap draws
+        seed: random seed, results do not depend on processes
+        processes: number of worker processes, if None, all cores, if 1, no pool
+        max_bytes: memory cap of draws held at once by one process, draws x dates x funds
+                   at about 64 bytes a value (returns and regression temporaries),
+                   a draw over the cap is regressed in blocks of funds,
+                   so memory is bounded by max(max_bytes, 64 bytes x dates) per process
+                   plus index arrays and t-stats (draws x dates and draws x funds)
+                   and the fitted and residual returns shared by draws (2 x dates x funds)
+        pcts: percentiles of cross-sectional t-stats distribution
+
+    #Return:
+        dict of pandas DataFrames:
+        "funds": alpha, tstat, pvalue (fraction of draws with t-stat >= actual) by fund
+        "percentiles": actual, simulated (mean of draws), pvalue (fraction of draws with
+        percentile >= actual) by percentile
+    """
+
+    benchmark = df_to_series(benchmark)
+    if isinstance(rets, pd.DataFrame) and isinstance(benchmark, pd.Series):
+        benchmark = benchmark.reindex(rets.index)
+    funds = rets.columns if isinstance(rets, pd.DataFrame) else None
+
+    y = np.asarray(rets, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    x = np.asarray(benchmark, dtype=float).ravel()
+
+    fit = simple_ols(y, x)
+    tstats = fit["alpha"] / fit["alpha_stderr"]
+    fitted = x[:, None] * fit["beta"]
+    resid = y - fit["alpha"] - fitted
+    pcts = np.asarray(pcts, dtype=float)
+
+    # chunks of draws under the memory cap, one seed per chunk,
+    # a draw over the cap is split by fund columns (one draw per chunk)
+    length, num = y.shape
+    chunk = max(1, int(max_bytes // (8 * 8 * length * num)))
+    cols = num if chunk > 1 else int(min(num, max(1, max_bytes // (8 * 8 * length))))
+    sizes = [min(chunk, n_boot - i) for i in range(0, n_boot, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, cols) for s, size in zip(seeds, sizes)]
+
+    if processes == 1:
+        _attach(resid, fitted, x, tstats, pcts)
+        results = [_draw_chunk(task) for task in tasks]
+    else:
+        workers = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(resid, fitted, x, tstats, pcts)) as pool:
+            results = list(pool.map(_draw_chunk, tasks))
+
+    beats = sum(r[0] for r in results)
+    counts = sum(r[1] for r in results)
+    sim_pcts = np.vstack([r[2] for r in results])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        funds_df = pd.DataFrame({
+            "alpha":fit["alpha"],
+            "tstat":tstats,
+            "pvalue":np.where(np.isfinite(tstats), beats / counts, np.nan)
+        }, index=funds)
+
+        actual = np.nanpercentile(tstats, pcts)
+        pcts_df = pd.DataFrame({
+            "actual":actual,
+            "simulated":np.nanmean(sim_pcts, axis=0),
+            "pvalue":np.mean(sim_pcts >= actual, axis=0)
+        }, index=pd.Index(pcts, name="percentile"))
+
+    return {
+        "funds":funds_df,
+        "percentiles":pcts_df
+    }
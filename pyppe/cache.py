@@ -0,0 +1,331 @@
+import contextlib
+import datetime as dt
+import numbers
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from .tdays import get_calendar, to_date
+
+
+# trans Wind options to a canonical string, e.g: {"PriceAdj": "F"} -> "PriceAdj=F"
+def options_key(**kwargs):
+    return ";".join([k + "=" + str(v) for k, v in sorted(kwargs.items())])
+
+
+# trans fields to a list of upper case field names, e.g: "high,low" -> ["HIGH", "LOW"]
+def fields_list(fields):
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    return [f.strip().upper() for f in fields]
+
+
+# return True if every value of data (list of values for each field) is a number or missing
+def numeric_data(data):
+    return all(v is None or isinstance(v, numbers.Number) for values in data for v in values)
+
+
+# local on-disk cache of Wind time series data
+class SeriesCache(object):
+    """
+    #Func:
+        local on-disk cache (SQLite) of Wind time series data
+        keyed by Wind code, field and Wind options (e.g: PriceAdj=F),
+        it remembers which trading day segments are stored,
+        so only the missing segments have to be fetched,
+        numeric fields only (text fields, e.g: trade_status, are not stored)
+
+    #Params:
+        path: path of the SQLite file, created if not exists
+        max_rows: size limit in stored values, least recently used series
+                  are evicted beyond it (series pinned by a running fetch are kept
+                  until it has loaded them), if None, no limit
+        revise_days: the last n stored trading days of a series are always
+                     treated as missing and fetched again (e.g: NAV revisions)
+        calendar: TradingCalendar that segments are measured on, if None, get_calendar()
+    """
+
+    def __init__(self, path, max_rows=None, revise_days=0, calendar=None):
+        self.path = path
+        self.max_rows = max_rows
+        self.revise_days = revise_days
+        self.calendar = get_calendar() if calendar is None else calendar
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        self._lock = threading.Lock()
+        self._pins = {} # key -> number of running fetches using the series
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, code TEXT, field TEXT, options TEXT,
+                rows INTEGER, last_access REAL);
+            CREATE TABLE IF NOT EXISTS segments (
+                key TEXT, sdate TEXT, edate TEXT);
+            CREATE TABLE IF NOT EXISTS observations (
+                key TEXT, date TEXT, value REAL, PRIMARY KEY (key, date)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS segments_key ON segments (key);
+        """)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    # return cache key of a series
+    def key(self, code, field, **kwargs):
+        return "|".join([code.upper(), field.upper(), options_key(**kwargs)])
+
+    # return stored trading day segments of a series as calendar positions
+    def _segments(self, key):
+        rows = self._conn.execute(
+            "SELECT sdate, edate FROM segments WHERE key = ? ORDER BY sdate", (key,)).fetchall()
+
+        return [(self.calendar.locate(s), self.calendar.locate(e)) for s, e in rows]
+
+    # return missing trading day segments of a series
+    def missing(self, code, field, sdate, edate, **kwargs):
+        """
+        #Func:
+            return missing trading day segments of a series from start date to end date
+
+        #Params:
+            code: Wind code, e.g: "000011.OF"
+            field: data field, e.g: "NAV_adj"
+            sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+            **kwargs: Wind options, ref: https://www.windquant.com/
+
+        #Return:
+            list of (start date, end date) in datetime.date format
+        """
+
+        dates = self.calendar.dates
+        spos = np.searchsorted(dates, np.datetime64(to_date(sdate), "D"), side="left")
+        epos = np.searchsorted(dates, np.datetime64(to_date(edate), "D"), side="right") - 1
+
+        with self._lock:
+            segments = self._segments(self.key(code, field, **kwargs))
+
+        # the last [revise_days] stored trading days are stale
+        if segments and self.revise_days > 0:
+            s, e = segments[-1]
+            segments[-1] = (s, e - self.revise_days)
+
+        gaps = []
+        pos = spos
+        for s, e in segments:
+            if s is None or e < pos:
+                continue
+            if s > epos:
+                break
+            if s > pos:
+                gaps.append((pos, s - 1))
+            pos = max(pos, e + 1)
+        if pos <= epos:
+            gaps.append((pos, epos))
+
+        return [(dates[s].item(), dates[e].item()) for s, e in gaps]
+
+    # store fetched data of a code
+    def store(self, code, fields, times, data, sdate, edate, **kwargs):
+        """
+        #Func:
+            store fetched data of a code, and mark start date to end date as stored
+
+        #Params:
+            code: Wind code, e.g: "000011.OF"
+            fields: data fields, e.g: ["NAV", "NAV_adj"]
+            times: dates of data, e.g: wind_data.Times
+            data: list of values for each field, e.g: wind_data.Data
+            sdate, edate: the fetched range, e.g: datetime.date(2018, 10, 10)
+            **kwargs: Wind options, ref: https://www.windquant.com/
+        """
+
+        fields = fields_list(fields)
+        if not numeric_data(data):
+            raise TypeError("SeriesCache stores numeric fields only: " + ",".join(fields))
+
+        days = [str(to_date(t)) for t in times]
+        options = options_key(**kwargs)
+        sday, eday = str(to_date(sdate)), str(to_date(edate))
+
+        with self._lock:
+            for field, values in zip(fields, data):
+                key = self.key(code, field, **kwargs)
+                rows = [(key, d, None if v is None or v != v else float(v)) for d, v in zip(days, values)]
+                self._conn.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?)", rows)
+                self._merge_segment(key, sday, eday)
+
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM observations WHERE key = ?", (key,)).fetchone()[0]
+                self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                                   (key, code.upper(), field, options, count, time.time()))
+
+            self._evict()
+            self._conn.commit()
+
+    # keep series of a code from eviction while a fetch is storing and loading them
+    @contextlib.contextmanager
+    def pin(self, code, fields, **kwargs):
+        """
+        #Func:
+            keep series of a code from eviction inside the with block,
+            e.g: between store() and load() of a fetch, other threads' stores included,
+            the size limit is applied again when the block exits
+
+        #Params:
+            code: Wind code, e.g: "000011.OF"
+            fields: data fields, e.g: "NAV", ["NAV", "NAV_adj"]
+            **kwargs: Wind options, ref: https://www.windquant.com/
+        """
+
+        keys = [self.key(code, field, **kwargs) for field in fields_list(fields)]
+        with self._lock:
+            for key in keys:
+                self._pins[key] = self._pins.get(key, 0) + 1
+
+        try:
+            yield self
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+                self._evict()
+                self._conn.commit()
+
+    # merge a new segment with the stored overlapping or adjacent segments
+    def _merge_segment(self, key, sday, eday):
+        spos = self.calendar.locate(sday)
+        epos = self.calendar.locate(eday)
+        spos = 0 if spos is None else spos
+
+        merged = []
+        for s, e in self._segments(key):
+            if s is not None and e is not None and s <= epos + 1 and e >= spos - 1:
+                spos, epos = min(spos, s), max(epos, e)
+            else:
+                merged.append((s, e))
+        merged.append((spos, epos))
+
+        dates = self.calendar.dates
+        self._conn.execute("DELETE FROM segments WHERE key = ?", (key,))
+        self._conn.executemany("INSERT INTO segments VALUES (?, ?, ?)",
+                               [(key, str(dates[s]), str(dates[e])) for s, e in merged
+                                if s is not None and e is not None])
+
+    # load stored data of a code
+    def load(self, code, fields, sdate, edate, **kwargs):
+        """
+        #Func:
+            load stored data of a code from start date to end date
+
+        #Params:
+            code: Wind code, e.g: "000011.OF"
+            fields: data fields, e.g: "NAV", ["NAV", "NAV_adj"]
+            sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+            **kwargs: Wind options, ref: https://www.windquant.com/
+
+        #Return:
+            pandas DataFrame with trading day index (datetime.date) and upper case field columns
+        """
+
+        fields = fields_list(fields)
+        days = self.calendar.range(sdate, edate)
+        df = pd.DataFrame(np.nan, index=days.astype(object), columns=fields)
+        pos = {d: i for i, d in enumerate(days.astype(str))}
+
+        if not len(days):
+            return df
+
+        with self._lock:
+            for field in fields:
+                key = self.key(code, field, **kwargs)
+                rows = self._conn.execute(
+                    "SELECT date, value FROM observations WHERE key = ? AND date >= ? AND date <= ?",
+                    (key, str(days[0]), str(days[-1]))).fetchall()
+
+                col = df[field].values.copy()
+                for d, v in rows:
+                    if d in pos and v is not None:
+                        col[pos[d]] = v
+                df[field] = col
+
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        return df
+
+    # drop stored data, e.g: after NAV revisions
+    def invalidate(self, code=None, field=None, sdate=None, **kwargs):
+        """
+        #Func:
+            drop stored data, so it is fetched again next time
+
+        #Params:
+            code: Wind code, if None, all codes
+            field: data field, if None, all fields of the code
+            sdate: drop from this date on, if None, the whole series
+            **kwargs: Wind options, only used with code and field given
+        """
+
+        with self._lock:
+            if code is None:
+                keys = [r[0] for r in self._conn.execute("SELECT key FROM entries")]
+            elif field is None:
+                keys = [r[0] for r in self._conn.execute(
+                    "SELECT key FROM entries WHERE code = ?", (code.upper(),))]
+            else:
+                keys = [self.key(code, field, **kwargs)]
+
+            for key in keys:
+                if sdate is None:
+                    self._drop(key)
+                    continue
+
+                sday = str(to_date(sdate))
+                self._conn.execute("DELETE FROM observations WHERE key = ? AND date >= ?", (key, sday))
+                self._conn.execute("DELETE FROM segments WHERE key = ? AND sdate >= ?", (key, sday))
+
+                prev = self.calendar.prev(to_date(sdate) - dt.timedelta(days=1))
+                if prev is not None:
+                    self._conn.execute("UPDATE segments SET edate = ? WHERE key = ? AND edate >= ?",
+                                       (str(prev), key, sday))
+
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM observations WHERE key = ?", (key,)).fetchone()[0]
+                self._conn.execute("UPDATE entries SET rows = ? WHERE key = ?", (count, key))
+
+            self._conn.commit()
+
+    # drop a whole series
+    def _drop(self, key):
+        for table in ["observations", "segments", "entries"]:
+            self._conn.execute("DELETE FROM " + table + " WHERE key = ?", (key,))
+
+    # return how many values are stored
+    def size(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT SUM(rows) FROM entries").fetchone()[0]
+
+        return rows or 0
+
+    # evict least recently used series beyond size limit
+    def _evict(self):
+        if self.max_rows is None:
+            return
+
+        entries = self._conn.execute(
+            "SELECT key, rows FROM entries ORDER BY last_access DESC").fetchall()
+
+        total = 0
+        for key, rows in entries:
+            total += rows
+            if total > self.max_rows and key not in self._pins:
+                self._drop(key)
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from .online import EwmaCovariance, _wrap_matrix
+from .ragged import _to_2d, masked_mean
+from .solvers import psd_projection
+
+
+# calc Ledoit-Wolf shrinkage covariance matrix of all columns of x
+# e.g: returns of funds
+def ledoit_wolf(x, min_periods=20, return_shrinkage=False):
+    """
+    #Func:
+        calc Ledoit-Wolf covariance matrix of all columns of x, the sample covariance
+        shrunk toward a scaled identity (average variance on the diagonal) by the
+        optimal intensity of Ledoit & Wolf (2004),
+        each pair uses the dates both columns are valid (pairwise complete),
+        so funds with short overlapping histories are shrunk harder,
+        pairs with fewer than min_periods dates are replaced by the target,
+        the pairwise sample covariance of columns with different valid rows is
+        projected to the nearest positive semi-definite matrix (O(N^3)) before shrinking,
+        so the result is positive semi-definite (positive definite if shrinkage > 0)
+        on columns with variance
+
+    #Params:
+        x: pandas dataframe or numpy array (date x fund), e.g: returns of funds
+        min_periods: min valid pairs, pairs below it take the target's value
+        return_shrinkage: if True, also return shrinkage intensity
+
+    #Return:
+        covariance matrix in pandas DataFrame (numpy array for numpy input),
+        NaN rows and columns for columns with fewer than min_periods values
+        (and shrinkage intensity in [0, 1], if return_shrinkage)
+    """
+
+    x, _, cols = _to_2d(x, labels=True)
+    num = x.shape[1]
+
+    mask = np.isfinite(x)
+    m = mask.astype(float)
+    xc = np.where(mask, x - masked_mean(x, mask, 0.0), 0.0)
+    x2 = xc * xc
+
+    n = m.T.dot(m) # pairs
+    enough = n >= max(min_periods, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(enough, xc.T.dot(xc) / n, 0.0) # sample covariance (1/n, as Ledoit-Wolf)
+        pi = np.where(enough, (x2.T.dot(x2) / n - s * s) / n, 0.0) # variance of every s[i, j]
+
+    has_var = np.diag(enough).copy()
+    s[~has_var, :] = np.nan
+    s[:, ~has_var] = np.nan
+    if not (mask[:, has_var] == mask[:, has_var][:, :1]).all():
+        s = psd_projection(s) # pairwise moments of different valid rows may be indefinite
+
+    cov = np.full((num, num), np.nan)
+    shrinkage = 1.0
+    k = has_var.sum()
+    if k:
+        sub = np.ix_(has_var, has_var)
+        mu = np.trace(s[sub]) / k
+        target = np.eye(k) * mu
+
+        d2 = ((s[sub] - target) ** 2).sum() / k
+        b2 = min(pi[sub].sum() / k, d2)
+        shrinkage = b2 / d2 if d2 > 0 else 1.0
+        cov[sub] = shrinkage * target + (1 - shrinkage) * s[sub]
+
+    cov = _wrap_matrix(cov, cols)
+    return (cov, shrinkage) if return_shrinkage else cov
+
+
+# calc Ledoit-Wolf covariance matrices on trailing windows as of dates
+def rolling_ledoit_wolf(x, window, dates=None, min_periods=20):
+    """
+    #Func:
+        calc Ledoit-Wolf covariance matrices on trailing windows as of dates
+
+    #Params:
+        x: pandas dataframe (date x fund), e.g: returns of funds
+        window: number of rows of a window, ending at (and including) the as-of date
+        dates: as-of dates, the last row on or before every date is used, if None, the last date
+        min_periods: min valid pairs, see ledoit_wolf
+
+    #Return:
+        dict of as-of date -> covariance matrix in pandas DataFrame
+    """
+
+    rows = _asof_rows(x.index, dates)
+
+    return {x.index[r]:ledoit_wolf(x.iloc[max(r - window + 1, 0):r + 1], min_periods) for r in rows}
+
+
+# trans as-of dates to rows of the last date on or before them
+def _asof_rows(index, dates=None):
+    if dates is None:
+        return [len(index) - 1]
+
+    days = np.asarray(pd.DatetimeIndex(index).values, dtype="datetime64[D]")
+    dates = np.asarray(pd.DatetimeIndex(dates).values, dtype="datetime64[D]")
+    rows = np.searchsorted(days, dates, side="right") - 1
+
+    return sorted(set(int(r) for r in rows[rows >= 0]))
+
+
+# calc exponentially weighted covariance matrices as of dates
+def ewma_cov(x, halflife=60, decay=None, dates=None, state=None, min_periods=20):
+    """
+    #Func:
+        calc exponentially weighted covariance matrices of all columns of x as of dates,
+        one pass over rows with O(N^2) per row, positive semi-definite (see EwmaCovariance)
+
+    #Params:
+        x: pandas dataframe (date x fund), e.g: returns of funds
+        halflife: rows for a weight to halve, e.g: 60
+        decay: weight decay per row, e.g: 0.94, if given, halflife is ignored
+        dates: as-of dates, the last row on or before every date is used, if None, the last date
+        state: EwmaCovariance of earlier rows to continue from (updated in place),
+               e.g: run on new days only, if None, start from scratch
+        min_periods: min valid pairs of a new state, see EwmaCovariance
+
+    #Return:
+        covariance matrix in pandas DataFrame as of the last date if dates is None,
+        dict of as-of date -> covariance matrix in pandas DataFrame otherwise
+    """
+
+    state = EwmaCovariance(list(x.columns), halflife, decay, min_periods) if state is None else state
+    values = np.asarray(x.values, dtype=float)
+
+    rows = _asof_rows(x.index, dates)
+    res = {}
+    start = 0
+    for r in rows:
+        state.update_block(values[start:r + 1])
+        res[x.index[r]] = state.cov()
+        start = r + 1
+    state.update_block(values[start:])
+
+    if dates is None:
+        return res[x.index[-1]] if res else state.cov()
+    return res
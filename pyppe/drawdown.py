@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from .periods import prds_per_year
+from .ragged import _to_2d, ffill
+
+
+# split every column into drawdown episodes, peak to next peak
+def _episodes(p):
+    length, num = p.shape
+
+    peak = np.fmax.accumulate(p, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = p / peak - 1
+    dd = np.where(np.isfinite(dd), dd, 0.0) # before inception
+
+    # flatten column by column, an episode starts at every new peak
+    flat = dd.T.ravel()
+    start = (flat == 0)
+    start[::length] = True
+    starts = np.flatnonzero(start)
+    group = np.cumsum(start) - 1
+
+    depth = np.minimum.reduceat(flat, starts)
+    pos = np.arange(len(flat))
+    trough = np.minimum.reduceat(np.where(flat == depth[group], pos, len(flat)), starts)
+
+    # recovery is the start of the next episode of the same column
+    col = starts // length
+    nxt = np.append(starts[1:], len(flat))
+    recovered = np.append(col[1:] == col[:-1], False)
+    recovery = np.where(recovered, nxt, -1)
+
+    return dd, {
+        "col":col,
+        "drawdown":depth,
+        "peak":starts - col * length,
+        "trough":trough - col * length,
+        "recovery":np.where(recovered, recovery - col * length, -1),
+        "recovered":recovered,
+        "duration":np.where(recovered, nxt, (col + 1) * length - 1) - starts
+    }
+
+
+# return drawdown episodes of every column of prices, deepest first
+def drawdown_episodes(prices, top=5):
+    """
+    #Func:
+        return the top n distinct drawdown episodes of every column of prices,
+        an episode runs from a peak to the next new peak (recovery),
+        all columns at once by grouped reductions, O(n) per series
+        (suspended NAV are forward filled)
+
+    #Params:
+        prices: prices series in pandas dataframe, pandas series or numpy array (date x fund)
+        top: number of deepest episodes per column, if None, all
+
+    #Return:
+        pandas DataFrame indexed by fund and rank (1 is the deepest), with columns
+        drawdown, peak, trough, recovery (NaT/NaN if not recovered),
+        duration (peak to recovery, or to last date, in periods),
+        time_to_recover (trough to recovery, in periods)
+    """
+
+    p, index, cols = _to_2d(prices, labels=True)
+    if index is None:
+        index, cols = pd.RangeIndex(p.shape[0]), pd.RangeIndex(p.shape[1])
+    _, ep = _episodes(ffill(p))
+
+    # deepest first within column
+    keep = ep["drawdown"] < 0
+    order = np.flatnonzero(keep)[np.lexsort((ep["drawdown"][keep], ep["col"][keep]))]
+    col = ep["col"][order]
+    first = np.searchsorted(col, col, side="left")
+    rank = np.arange(len(order)) - first + 1
+    if top is not None:
+        order, col, rank = order[rank <= top], col[rank <= top], rank[rank <= top]
+
+    recovered = ep["recovered"][order]
+    recovery = np.asarray(index[np.where(recovered, ep["recovery"][order], 0)], dtype=object)
+    recovery[~recovered] = None
+
+    result = pd.DataFrame({
+        "drawdown":ep["drawdown"][order],
+        "peak":index[ep["peak"][order]],
+        "trough":index[ep["trough"][order]],
+        "recovery":recovery,
+        "duration":ep["duration"][order],
+        "time_to_recover":np.where(recovered, ep["recovery"][order] - ep["trough"][order], np.nan)
+    }, index=pd.MultiIndex.from_arrays([cols[col], rank], names=["fund", "rank"]))
+
+    if isinstance(index, pd.DatetimeIndex):
+        result["recovery"] = pd.to_datetime(result["recovery"])
+
+    return result
+
+
+# return drawdown statistics of every column of prices
+def drawdown_report(prices, period="d"):
+    """
+    #Func:
+        return drawdown statistics of every column of prices,
+        all columns at once by grouped reductions, O(n) per series
+        (suspended NAV are forward filled)
+
+    #Params:
+        prices: prices series in pandas dataframe, pandas series or numpy array (date x fund)
+        period: freq of prices (daily, weekly, monthly...)
+
+    #Return:
+        pandas DataFrame indexed by fund, with columns
+        max_drawdown, peak, trough, recovery, duration, time_to_recover (of max drawdown),
+        max_underwater (longest episode, in periods), current_drawdown,
+        annl_rets, calmar (annl_rets / -max_drawdown)
+    """
+
+    p, index, cols = _to_2d(prices, labels=True)
+    if index is None:
+        index, cols = pd.RangeIndex(p.shape[0]), pd.RangeIndex(p.shape[1])
+    p = ffill(p)
+    dd, ep = _episodes(p)
+
+    worst = drawdown_episodes(pd.DataFrame(p, index=index, columns=cols), top=1)
+    worst = worst.reset_index(level="rank", drop=True).reindex(cols)
+    worst = worst.rename(columns={"drawdown":"max_drawdown"})
+    worst["max_drawdown"] = worst["max_drawdown"].fillna(0.0)
+
+    max_underwater = np.zeros(len(cols))
+    np.maximum.at(max_underwater, ep["col"], np.where(ep["drawdown"] < 0, ep["duration"], 0))
+
+    # annualized return from first valid price to last price
+    ppy = prds_per_year(period)
+    valid = np.isfinite(p)
+    first = np.argmax(valid, axis=0)
+    nobs = len(p) - 1 - first
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = p[-1] / p[first, np.arange(len(cols))]
+        annl_rets = np.where(nobs > 0, growth ** (ppy / nobs) - 1, np.nan)
+        calmar = annl_rets / -worst["max_drawdown"].values
+
+    worst["max_underwater"] = max_underwater
+    worst["current_drawdown"] = dd[-1]
+    worst["annl_rets"] = annl_rets
+    worst["calmar"] = np.where(worst["max_drawdown"].values < 0, calmar, np.nan)
+
+    return worst
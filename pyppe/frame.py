@@ -0,0 +1,402 @@
+import inspect
+import warnings
+import numpy as np
+import pandas as pd
+
+from .periods import prds_per_year
+from .ragged import ragged_rets, range_counts
+
+
+# calc count, sum and sum of squares of masked values by column
+def _moments(x, mask):
+    x0 = np.where(mask, x, 0.0)
+    n = mask.sum(axis=0)
+    s1 = x0.sum(axis=0)
+    s2 = (x0 * x0).sum(axis=0)
+
+    return n, s1, s2
+
+
+# calc standard deviation from count, sum and sum of squares
+def _std(n, s1, s2, dof=1):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = (s2 - s1 * s1 / n) / (n - dof)
+
+    return np.sqrt(np.where(n > dof, np.clip(v, 0, None), np.nan))
+
+
+# operations of PerformanceFrame: name -> function(frame, **params)
+_ops = {}
+
+# per-fund metrics in perf_report's order
+report_metrics = ["nobs", "arith_avg", "geo_avg", "median", "std", "annl_std", "downside_std",
+                  "upside_std", "cagr_rets", "annl_rets", "max_drawdown"]
+
+
+# register a function as an operation of PerformanceFrame
+def _op(kind):
+    def register(func):
+        _ops[func.__name__] = (kind, func)
+        return func
+
+    return register
+
+
+# lazy expression of a PerformanceFrame, evaluated on first access of value
+class Expr(object):
+    """
+    #Func:
+        lazy expression of a PerformanceFrame, e.g: pf.annl_std(),
+        nothing is computed until value is accessed or pf.evaluate() is called
+
+    #Params:
+        frame: PerformanceFrame
+        op: operation name, e.g: "annl_std"
+        params: operation parameters, e.g: {"line": 0}
+    """
+
+    def __init__(self, frame, op, params):
+        self.frame = frame
+        self.op = op
+        self.params = params
+
+    @property
+    def key(self):
+        return (self.op,) + tuple(sorted(self.params.items()))
+
+    @property
+    def value(self):
+        return self.frame.evaluate(self)
+
+    def __repr__(self):
+        args = ", ".join("%s=%r" % kv for kv in sorted(self.params.items()))
+        return "Expr(%s(%s))" % (self.op, args)
+
+
+# lazy wrapper of a prices/returns matrix with memoized metric evaluation
+class PerformanceFrame(object):
+    """
+    #Func:
+        lazy wrapper of a prices/returns matrix (date x fund),
+        metrics build expressions (Expr) instead of computing at once,
+        evaluating them computes every shared intermediate (returns, masks,
+        moments, log growth, running peaks...) once and keeps it
+        until the data changes by update()
+
+        e.g:
+            pf = PerformanceFrame(prices=navs, benchmark=index_rets)
+            pf.annl_std().value # computes returns and moments
+            pf.downside_std().value # reuses returns
+            pf.report(["annl_std", "downside_std", "r_sqr"])
+
+    #Params:
+        prices: prices in pandas DataFrame or Series with date index
+        rets: simple returns in pandas DataFrame or Series, if None, returns of prices
+        period: freq of series (daily, weekly, monthly...)
+        benchmark: returns of a benchmark aligned with rets (pandas Series or numpy array)
+        suspended: None, or handling of a ragged universe, "nan" or "zero", see perf_report
+    """
+
+    def __init__(self, prices=None, rets=None, period="d", benchmark=None, suspended=None):
+        if prds_per_year(period) is None:
+            raise ValueError("unknown period: " + str(period))
+
+        self.period = period
+        self.suspended = suspended
+        self.update(prices, rets, benchmark)
+
+    # set data, memoized results are dropped
+    def update(self, prices=None, rets=None, benchmark=None):
+        """
+        #Func:
+            set data (copied), memoized results are dropped
+
+        #Params:
+            prices, rets, benchmark: see PerformanceFrame
+        """
+
+        if prices is None and rets is None:
+            raise ValueError("prices or rets is needed")
+
+        source = prices if prices is not None else rets
+        if isinstance(source, pd.Series):
+            source = source.to_frame()
+        shape = np.shape(source) if np.ndim(source) == 2 else (len(source), 1)
+        self.index = source.index if isinstance(source, pd.DataFrame) else pd.RangeIndex(shape[0])
+        self.columns = source.columns if isinstance(source, pd.DataFrame) else pd.RangeIndex(shape[1])
+
+        self._prices = None if prices is None else np.array(prices, dtype=float).reshape(shape)
+        self._rets = None if rets is None else np.array(rets, dtype=float).reshape(-1, shape[1])
+        self._benchmark = None if benchmark is None else np.array(benchmark, dtype=float).ravel()
+        self.invalidate()
+
+    # drop memoized results
+    def invalidate(self):
+        self._memo = {}
+        self.evaluations = {} # op -> times computed, for inspection
+
+    # return an expression of an operation
+    def expr(self, op, **params):
+        if op not in _ops:
+            raise ValueError("unknown metric: " + str(op))
+        return Expr(self, op, params)
+
+    # return memoized value of an operation, computed on first call
+    def get(self, op, **params):
+        key = (op,) + tuple(sorted(params.items()))
+        if key not in self._memo:
+            self._memo[key] = _ops[op][1](self, **params)
+            self.evaluations[op] = self.evaluations.get(op, 0) + 1
+
+        return self._memo[key]
+
+    # evaluate expressions, shared intermediates are computed once
+    def evaluate(self, *exprs):
+        """
+        #Func:
+            evaluate expressions, shared intermediates are computed once
+
+        #Params:
+            *exprs: Expr of this frame, or operation names
+
+        #Return:
+            value of one expression, or a list of values:
+            pandas Series indexed by fund for per-fund metrics,
+            pandas DataFrame for date x fund results
+        """
+
+        values = []
+        for e in exprs:
+            if isinstance(e, str):
+                e = self.expr(e)
+            values.append(self._wrap(e.op, self.get(e.op, **e.params)))
+
+        return values[0] if len(values) == 1 else values
+
+    # wrap a numpy result like the input
+    def _wrap(self, op, a):
+        kind = _ops[op][0]
+        if kind == "fund":
+            return pd.Series(a, index=self.columns, name=op)
+        if kind in ("prices", "rets"):
+            # prices rebuilt from returns have a base row before the first date
+            a = a[max(len(a) - len(self.index), 0):]
+            return pd.DataFrame(a, index=self.index[len(self.index) - len(a):], columns=self.columns)
+        return a
+
+    # return metrics of every fund in one DataFrame
+    def report(self, metrics=None, **params):
+        """
+        #Func:
+            return metrics of every fund in one DataFrame, shared intermediates computed once
+
+        #Params:
+            metrics: list of metric names, if None, the metrics of perf_report
+            **params: parameters passed to metrics taking them, e.g: line=0
+
+        #Return:
+            pandas DataFrame indexed by fund with metric columns
+        """
+
+        metrics = report_metrics if metrics is None else metrics
+        res = {}
+        for m in metrics:
+            names = inspect.signature(_ops[m][1]).parameters
+            res[m] = self.get(m, **{k:v for k, v in params.items() if k in names})
+
+        return pd.DataFrame(res, index=self.columns, columns=metrics)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in _ops:
+            raise AttributeError(name)
+
+        return lambda **params: self.expr(name, **params)
+
+
+# intermediates
+
+@_op("prices")
+def prices(pf):
+    if pf._prices is not None:
+        return pf._prices
+
+    # rebuild prices from returns, starting at 1
+    valid = pf.get("valid")
+    p = np.exp(np.vstack([np.zeros((1, valid.shape[1])), np.cumsum(pf.get("log_growth"), axis=0)]))
+    p[1:][~valid] = np.nan
+
+    return p
+
+
+@_op("rets")
+def rets(pf):
+    if pf._rets is not None:
+        return pf._rets
+
+    p = pf._prices
+    if pf.suspended is not None:
+        return ragged_rets(p, pf.suspended)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return p[1:] / p[:-1] - 1
+
+
+@_op("other")
+def valid(pf):
+    return np.isfinite(pf.get("rets"))
+
+
+@_op("other")
+def mask(pf, side="all", line=0):
+    valid, r = pf.get("valid"), pf.get("rets")
+    with np.errstate(invalid="ignore"):
+        if side == "down":
+            return valid & (r < line)
+        if side == "up":
+            return valid & (r > line)
+
+    return valid
+
+
+@_op("other")
+def moments(pf, side="all", line=0):
+    if side == "all":
+        return _moments(pf.get("rets"), pf.get("valid"))
+    return _moments(pf.get("rets"), pf.get("mask", side=side, line=line))
+
+
+@_op("other")
+def log_growth(pf):
+    valid = pf.get("valid")
+    return np.where(valid, np.log1p(np.where(valid, pf.get("rets"), 0.0)), 0.0)
+
+
+@_op("other")
+def sum_log(pf):
+    return pf.get("log_growth").sum(axis=0)
+
+
+# periods to annualize by: observations, or periods elapsed in every column's valid range
+@_op("fund")
+def periods(pf):
+    if pf.suspended is None:
+        return pf.get("nobs")
+    return range_counts(pf.get("rets"))
+
+
+@_op("prices")
+def peak(pf):
+    return np.fmax.accumulate(pf.get("prices"), axis=0)
+
+
+@_op("prices")
+def drawdown(pf):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pf.get("prices") / pf.get("peak") - 1
+
+
+# pairs of funds' returns and benchmark's returns both valid: n, sx, sy, sxx, syy, sxy
+@_op("other")
+def cross_moments(pf):
+    if pf._benchmark is None:
+        raise ValueError("benchmark is needed")
+
+    r = pf.get("rets")
+    b = pf._benchmark[len(pf._benchmark) - len(r):][:, None]
+    pairs = pf.get("valid") & np.isfinite(b)
+    x = np.where(pairs, r, 0.0)
+    y = np.where(pairs, b, 0.0)
+
+    return pairs.sum(axis=0), x.sum(axis=0), y.sum(axis=0), (x * x).sum(axis=0), \
+        (y * y).sum(axis=0), (x * y).sum(axis=0)
+
+
+# per-fund metrics
+
+@_op("fund")
+def nobs(pf):
+    return pf.get("moments")[0]
+
+
+@_op("fund")
+def arith_avg(pf):
+    n, s1, _ = pf.get("moments")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return s1 / n
+
+
+@_op("fund")
+def geo_avg(pf):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.expm1(pf.get("sum_log") / pf.get("nobs"))
+
+
+@_op("fund")
+def median(pf):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # all-NaN columns
+        return np.nanmedian(np.where(pf.get("valid"), pf.get("rets"), np.nan), axis=0)
+
+
+@_op("fund")
+def std(pf, dof=1):
+    return _std(*pf.get("moments"), dof=dof)
+
+
+@_op("fund")
+def annl_std(pf):
+    return pf.get("std") * prds_per_year(pf.period) ** 0.5
+
+
+@_op("fund")
+def downside_std(pf, line=0):
+    return _std(*pf.get("moments", side="down", line=line)) * prds_per_year(pf.period) ** 0.5
+
+
+@_op("fund")
+def upside_std(pf, line=0):
+    return _std(*pf.get("moments", side="up", line=line)) * prds_per_year(pf.period) ** 0.5
+
+
+@_op("fund")
+def cagr_rets(pf):
+    return np.where(pf.get("nobs") > 0, np.expm1(pf.get("sum_log")), np.nan)
+
+
+@_op("fund")
+def annl_rets(pf):
+    n = pf.get("nobs")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 0, np.expm1(pf.get("sum_log") * prds_per_year(pf.period) / pf.get("periods")), np.nan)
+
+
+@_op("fund")
+def max_drawdown(pf):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # all-NaN columns
+        return np.nanmin(pf.get("drawdown"), axis=0)
+
+
+@_op("fund")
+def cov(pf, dof=1):
+    n, sx, sy, _, _, sxy = pf.get("cross_moments")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > dof, (sxy - sx * sy / n) / (n - dof), np.nan)
+
+
+@_op("fund")
+def cor(pf):
+    n, sx, sy, sxx, syy, sxy = pf.get("cross_moments")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+
+
+@_op("fund")
+def r_sqr(pf):
+    return pf.get("cor") ** 2
+
+
+@_op("fund")
+def beta(pf):
+    n, sx, sy, _, syy, sxy = pf.get("cross_moments")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (sxy - sx * sy / n) / (syy - sy * sy / n)
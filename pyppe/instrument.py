@@ -0,0 +1,259 @@
+import functools
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+# registries recording events, innermost last, nothing is recorded if empty
+_active = []
+_active_lock = threading.Lock()
+
+# clock of events, seconds
+clock = time.perf_counter
+
+
+# registry of timed events: provider calls, solver work, model runs
+class Registry(object):
+    """
+    #Func:
+        registry of timed events (provider calls, solver work, model runs),
+        records while activated by "with registry:", thread safe,
+        worker processes (e.g: batch_rbsa) are not recorded
+
+        e.g:
+            registry = Registry()
+            with registry:
+                wind_series(codes, "NAV_adj", sdate, edate)
+            print(registry.summary())
+            registry.save_trace("trace.json") # open in chrome://tracing or Perfetto
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+        self._origin = clock()
+
+    def __enter__(self):
+        with _active_lock:
+            _active.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        with _active_lock:
+            _active.remove(self)
+        return False
+
+    # add an event started at start (clock seconds) and ended now
+    def add(self, name, cat, start, args):
+        event = {"name":name, "cat":cat, "start":start - self._origin, "duration":clock() - start,
+                 "pid":os.getpid(), "tid":threading.get_ident(), "args":args}
+        with self._lock:
+            self.events.append(event)
+
+    # remove all events
+    def clear(self):
+        with self._lock:
+            self.events = []
+        self._origin = clock()
+
+    # return a summary of events by name
+    def summary(self):
+        """
+        #Func:
+            return a summary of events by name
+
+        #Return:
+            pandas DataFrame indexed by event name with columns:
+            count, total_time, mean_time, max_time (seconds),
+            rows (data rows returned), iterations (solver iterations),
+            errors (error code or exception), failures (solver not converged)
+        """
+
+        columns = ["cat", "count", "total_time", "mean_time", "max_time",
+                   "rows", "iterations", "errors", "failures"]
+        with self._lock:
+            events = list(self.events)
+        if not events:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.DataFrame({
+            "name":[e["name"] for e in events],
+            "cat":[e["cat"] for e in events],
+            "time":[e["duration"] for e in events],
+            "rows":[e["args"].get("rows", 0) for e in events],
+            "iterations":[e["args"].get("iterations", 0) for e in events],
+            "errors":[bool(e["args"].get("error_code") or e["args"].get("error")) for e in events],
+            "failures":[e["args"].get("converged") is False for e in events],
+        })
+        grouped = df.groupby("name", sort=False)
+
+        res = pd.DataFrame({
+            "cat":grouped["cat"].first(),
+            "count":grouped.size(),
+            "total_time":grouped["time"].sum(),
+            "mean_time":grouped["time"].mean(),
+            "max_time":grouped["time"].max(),
+            "rows":grouped["rows"].sum(),
+            "iterations":grouped["iterations"].sum(),
+            "errors":grouped["errors"].sum(),
+            "failures":grouped["failures"].sum(),
+        }, columns=columns)
+
+        return res.sort_values("total_time", ascending=False)
+
+    # return counts of error codes by event name
+    def error_codes(self):
+        counts = {}
+        with self._lock:
+            for e in self.events:
+                code = e["args"].get("error_code") or e["args"].get("error")
+                if code:
+                    by_name = counts.setdefault(e["name"], {})
+                    by_name[code] = by_name.get(code, 0) + 1
+
+        return counts
+
+    # return events in Chrome trace event format
+    def trace(self):
+        """
+        #Func:
+            return events in Chrome trace event format (complete events, microseconds),
+            viewable in chrome://tracing or https://ui.perfetto.dev
+
+        #Return:
+            dict of {"traceEvents": [...]}
+        """
+
+        with self._lock:
+            events = [{"name":e["name"], "cat":e["cat"], "ph":"X",
+                       "ts":e["start"] * 1e6, "dur":e["duration"] * 1e6,
+                       "pid":e["pid"], "tid":e["tid"],
+                       "args":{k:_jsonable(v) for k, v in e["args"].items()}} for e in self.events]
+
+        return {"traceEvents":events, "displayTimeUnit":"ms"}
+
+    # save events to a Chrome trace JSON file
+    def save_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+    # save summary and error codes to a JSON file
+    def save_summary(self, path):
+        summary = self.summary()
+        data = {"summary":{name:{k:_jsonable(v) for k, v in row.items()} for name, row in summary.iterrows()},
+                "error_codes":{name:{str(k):v for k, v in codes.items()}
+                               for name, codes in self.error_codes().items()}}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+# trans numpy scalars and other values to JSON friendly values
+def _jsonable(v):
+    if hasattr(v, "item"):
+        return v.item()
+    if isinstance(v, (str, int, float, bool)) or v is None:
+        return v
+    return str(v)
+
+
+# return True if any registry is recording
+def enabled():
+    return bool(_active)
+
+
+# record an event started at start (clock seconds) and ended now
+def record(name, cat, start, **args):
+    """
+    #Func:
+        record an event started at start and ended now into all active registries,
+        no-op if none is active, cheap enough for inner loops
+
+    #Params:
+        name: event name, e.g: "solver.simplex_lsq"
+        cat: event category, e.g: "solver"
+        start: clock() when the event started
+        **args: e.g: rows, iterations, error_code, converged
+    """
+
+    if _active:
+        for registry in list(_active):
+            registry.add(name, cat, start, args)
+
+
+# null span when no registry is active, args written to it are dropped
+class _NullSpan(dict):
+
+    def __setitem__(self, key, value):
+        pass
+
+
+# context manager timing a block as an event
+class span(object):
+    """
+    #Func:
+        context manager timing a block as an event, args set on the yielded dict
+        are recorded with it, an exception is recorded as "error" (error_code of WindError)
+
+        e.g:
+            with span("provider.wsd", "provider", code=code) as args:
+                data = provider.wsd(...)
+                args["rows"] = len(data.Times)
+
+    #Params:
+        name: event name
+        cat: event category
+        **args: event arguments
+    """
+
+    def __init__(self, name, cat="pyppe", **args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        if not _active:
+            self.start = None
+            return _NullSpan()
+
+        self.start = clock()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is None:
+            return False
+
+        if exc is not None:
+            if getattr(exc, "code", None) is not None:
+                self.args.setdefault("error_code", exc.code)
+            else:
+                self.args.setdefault("error", exc_type.__name__)
+        record(self.name, self.cat, self.start, **self.args)
+
+        return False
+
+
+# decorator timing every call of a function as an event
+def timed(name=None, cat="pyppe"):
+    """
+    #Func:
+        decorator timing every call of a function as an event
+
+    #Params:
+        name: event name, if None, "[module].[function]"
+        cat: event category
+    """
+
+    def decorator(func):
+        event = name or func.__module__.split(".")[-1] + "." + func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return func(*args, **kwargs)
+            with span(event, cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,13 +1,20 @@
 import datetime as dt
+import os
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
 from scipy import stats
 from scipy.optimize import curve_fit
-from scipy.optimize import minimize 
-from scipy.optimize import nnls 
-from WindPy import *
 
-from .periods import prds_per_year
+from .instrument import timed
+from .online import StyleFilter
+from .periods import prds_per_year, tdays_per_prd
+from .regression import batch_ols, simple_ols
+from .resample import period_ends
+from .solvers import RollingStyleLSQ
+from .stats import df_to_series
+from .tdays import tdays_offset, to_date, today
 from .windapi import wind_series
 
 # some style index suites (Wind code)
@@ -32,40 +39,370 @@ sws_c = ["801811.SI", "801812.SI", "801813.SI"] # LC, MC, SC
 sws_pe = ["801821.SI", "801822.SI", "801823.SI"] # HPE, MPE, LPE
 sws_price = ["801841.SI", "801842.SI", "801843.SI"] #HPRICE, MPRICE, LPRICE
 
+# all style index suites above by name
+style_suites = {
+                "csi_300_gv":csi_300_gv,
+                "cni_cgv_4":cni_cgv_4,
+                "cni_cgv_6":cni_cgv_6,
+                "cni_gv":cni_gv,
+                "citic_style":citic_style,
+                "sws_c":sws_c,
+                "sws_pe":sws_pe,
+                "sws_price":sws_price
+               }
+
 
 # calc trailing return based style analysis(rbsa)
-def trailing_rbsa(rets, style, period="m"):
+@timed("models.trailing_rbsa", "model")
+def trailing_rbsa(rets, style, period="m", refresh=250):
+    """
+    #Func:
+        calc trailing return based style analysis(rbsa),
+        long-only and fully-invested style weights on a window of [period] trading days
+        sliding one day at a time, each window is labeled by the day after it
+
+    #Params:
+        rets: returns series of a fund, pandas dataframe (first column), pandas series or numpy array
+        style: returns of style indices (aligned with rets), pandas dataframe or numpy array
+        period: window in trading days, or "w", "m", "q", "s", "y"
+        refresh: rebuild window sums from scratch every [refresh] slides
+
+    #Return:
+        style weights in pandas DataFrame,
+        NaN for windows with fewer valid observations than style indices
+    """
+
     if isinstance(period, str):
         period = tdays_per_prd(period)
-        
+
     if isinstance(rets, (pd.DataFrame)):
-        rets = rets[rets.columns[0]].values
+        rets = rets[rets.columns[0]]
+    rets = np.asarray(rets, dtype=float)
+
     if isinstance(style, (pd.DataFrame)):
         idx = style.index[period:]
         cols = style.columns
         style = style.values
-        
+    else:
+        idx = pd.RangeIndex(period, len(style))
+        cols = None
+    style = np.asarray(style, dtype=float)
+
     length = len(rets)
     num_style = style.shape[1]
-    
-    def fn(x, A, b):
-        return np.linalg.norm(A.dot(x) - b)
 
-    cons = {'type': 'eq', 'fun': lambda x:  np.sum(x)-1} # constraints
-    bds = [[0.0, None]] * num_style # bounds
-    
-    factors = []
-    
-    for i in range(0, length-period):
-        x0, rnorm = nnls(style[i: i+period-1], rets[i: i+period-1])
-        minout = minimize(fn, x0, args=(style[i: i+period-1], rets[i: i+period-1]),
-                          method='SLSQP', bounds=bds, constraints=cons)
-        
-        factors.append(minout.x)
+    solver = RollingStyleLSQ(num_style)
+    factors = np.empty((max(length - period, 0), num_style))
+
+    for i in range(0, length - period):
+        if i % refresh == 0:
+            solver.reset(style[i: i+period], rets[i: i+period])
+        else:
+            # slide window: drop row i-1, add row i+period-1
+            solver.remove(style[i-1], rets[i-1])
+            solver.add(style[i+period-1], rets[i+period-1])
+
+        if solver.count < num_style:
+            factors[i] = np.nan
+            solver.weights = None
+        else:
+            factors[i] = solver.solve()
 
     return pd.DataFrame(factors, index=idx, columns=cols)
 
 
+# style returns shared with worker processes of batch_rbsa
+_shared_style = {}
+
+
+# attach a worker process to the shared style returns
+def _attach_style(name, shape):
+    shm = SharedMemory(name=name)
+    _shared_style["shm"] = shm
+    _shared_style["style"] = np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+
+# calc trailing rbsa of one fund on the shared style returns
+def _rbsa_task(args):
+    rets, period, refresh = args
+    return trailing_rbsa(rets, _shared_style["style"], period, refresh).values
+
+
+# return Wind codes of a style suite given by name (in suites first, then style_suites) or codes
+def _suite_codes(suite, suites=None):
+    if isinstance(suite, str):
+        if suites is not None and suite in suites:
+            return list(suites[suite])
+        return list(style_suites[suite])
+    return list(suite)
+
+
+# returns of all style suites on trading calendar, loaded once and shared by funds
+class StyleData(object):
+    """
+    #Func:
+        returns of all style suites on trading calendar, close prices of every
+        style index are fetched by one wind_series call and kept as one
+        date x code matrix, each suite's returns are gathered once,
+        then every fund gets its dates by index lookups only
+
+        e.g:
+            data = StyleData("2015-01-01")
+            style = data.align("cni_cgv_6", rets.index) # per fund, no Wind request
+            data.extend() # next day, only new days are fetched
+
+    #Params:
+        sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+                      if edate is None, today
+        suites: dict of name -> Wind codes, if None, style_suites
+        cache: SeriesCache passed to wind_series
+        **kwargs: ref: https://www.windquant.com/
+    """
+
+    def __init__(self, sdate, edate=None, suites=None, cache=None, **kwargs):
+        self.suites = dict(style_suites if suites is None else suites)
+        self.codes = pd.Index(sorted(set(c for codes in self.suites.values() for c in codes)))
+        self.cache = cache
+        self.kwargs = kwargs
+
+        self.dates = np.empty(0, dtype="datetime64[D]") # dates of returns
+        self._prices = np.empty((0, len(self.codes)))
+        self._price_dates = np.empty(0, dtype="datetime64[D]")
+        self._matrices = {}
+
+        sdate = tdays_offset(-1, sdate, **kwargs) # one more day for the first return
+        self._load(sdate, edate)
+
+    # fetch close prices from start date to end date and append days after loaded ones
+    def _load(self, sdate, edate=None):
+        prices = wind_series(list(self.codes), "close", sdate, today() if edate is None else edate,
+                             cache=self.cache, **self.kwargs)
+        prices.columns = prices.columns.get_level_values(0)
+        prices = prices.reindex(columns=self.codes)
+
+        days = np.asarray(pd.DatetimeIndex(prices.index).values, dtype="datetime64[D]")
+        if len(self._price_dates):
+            new = days > self._price_dates[-1]
+            days, values = days[new], prices.values[new]
+        else:
+            values = prices.values
+        if not len(days):
+            return
+
+        self._price_dates = np.concatenate([self._price_dates, days])
+        self._prices = np.concatenate([self._prices, values.astype(float)])
+
+        p = self._prices
+        self.dates = self._price_dates[1:]
+        self.rets = p[1:] / p[:-1] - 1
+        self._matrices = {}
+
+    # fetch days after loaded ones until end date
+    def extend(self, edate=None):
+        if not len(self._price_dates):
+            raise ValueError("no style data loaded")
+        self._load(self._price_dates[-1].item(), edate)
+
+    # return returns of a suite on all loaded dates, numpy array
+    def matrix(self, suite):
+        key = tuple(_suite_codes(suite, self.suites))
+        if key not in self._matrices:
+            pos = self.codes.get_indexer(list(key))
+            if np.any(pos < 0):
+                raise KeyError("style indices not loaded: " + str(list(np.asarray(key)[pos < 0])))
+            self._matrices[key] = np.ascontiguousarray(self.rets[:, pos])
+
+        return self._matrices[key]
+
+    # return returns of a suite from start date to end date
+    def frame(self, suite, sdate=None, edate=None):
+        spos = 0 if sdate is None else np.searchsorted(self.dates, np.datetime64(to_date(sdate), "D"))
+        epos = len(self.dates) if edate is None else \
+            np.searchsorted(self.dates, np.datetime64(to_date(edate), "D"), side="right")
+
+        return pd.DataFrame(self.matrix(suite)[spos:epos], index=pd.DatetimeIndex(self.dates[spos:epos]),
+                            columns=_suite_codes(suite, self.suites), copy=False)
+
+    # return returns of a suite aligned with dates, NaN for dates not loaded
+    def align(self, suite, dates):
+        """
+        #Func:
+            return returns of a suite aligned with dates (e.g: index of a fund's returns)
+            by index lookups on the loaded matrix
+
+        #Params:
+            suite: name in suites of StyleData or style_suites (e.g: "cni_cgv_6"),
+                   or Wind codes (e.g: cni_cgv_6)
+            dates: dates, e.g: index of funds' returns
+
+        #Return:
+            returns of style indices in pandas DataFrame, with dates index and Wind code columns
+        """
+
+        index = pd.DatetimeIndex(dates)
+        days = np.asarray(index.values, dtype="datetime64[D]")
+        mat = self.matrix(suite)
+
+        pos = np.searchsorted(self.dates, days).clip(0, max(len(self.dates) - 1, 0))
+        found = (self.dates[pos] == days) if len(self.dates) else np.zeros(len(days), dtype=bool)
+        values = np.full((len(days), mat.shape[1]), np.nan)
+        values[found] = mat[pos[found]]
+
+        return pd.DataFrame(values, index=index, columns=_suite_codes(suite, self.suites))
+
+
+# return returns of a style suite aligned with dates
+def style_rets(suite, dates, data=None, **kwargs):
+    """
+    #Func:
+        fetch close prices of a style suite and return its returns aligned with dates
+
+    #Params:
+        suite: Wind codes of style indices, e.g: cni_cgv_6, citic_style,
+               or a name in style_suites, e.g: "cni_cgv_6"
+        dates: trading days, e.g: index of funds' returns
+        data: StyleData, if given, returns are taken from it instead of fetched
+        **kwargs: ref: https://www.windquant.com/
+
+    #Return:
+        returns of style indices in pandas DataFrame, with dates index and Wind code columns
+    """
+
+    if data is not None:
+        return data.align(suite, dates)
+
+    sdate = tdays_offset(-1, dates[0]) # one more day for the first return
+    prices = wind_series(_suite_codes(suite), "close", sdate, dates[-1], **kwargs)
+    prices.columns = prices.columns.get_level_values(0)
+
+    rets = prices.pct_change().iloc[1:]
+    rets.index = pd.DatetimeIndex(rets.index)
+
+    return rets.reindex(pd.DatetimeIndex(dates))
+
+
+# calc trailing rbsa of many funds on one style suite
+@timed("models.batch_rbsa", "model")
+def batch_rbsa(rets, style, period="m", processes=None, refresh=250, data=None):
+    """
+    #Func:
+        calc trailing return based style analysis(rbsa) of many funds on one style suite,
+        funds are spread over a process pool, and the style returns are
+        put in shared memory once instead of pickled to every task
+
+    #Params:
+        rets: returns of funds in pandas DataFrame, with date index and fund columns
+        style: returns of style indices aligned with rets in pandas DataFrame,
+               or a style suite (e.g: cni_cgv_6, "cni_cgv_6") fetched via style_rets()
+        period: window in trading days, or "w", "m", "q", "s", "y"
+        processes: number of worker processes, if None, all cores, if 1, no pool
+        refresh: rebuild window sums from scratch every [refresh] slides
+        data: StyleData the style suite is taken from, if None, fetched via Wind API
+
+    #Return:
+        style weights in pandas Series named "weight",
+        indexed by fund, date and style (windows without enough data are dropped)
+    """
+
+    if isinstance(period, str):
+        period = tdays_per_prd(period)
+
+    if isinstance(style, (list, str)):
+        style = style_rets(style, rets.index, data)
+
+    funds = rets.columns
+    idx = style.index[period:]
+    cols = style.columns
+    values = np.ascontiguousarray(style.values, dtype=float)
+    tasks = [(rets[f].values.astype(float), period, refresh) for f in funds]
+
+    if processes == 1:
+        results = [trailing_rbsa(r, values, p, n).values for r, p, n in tasks]
+    else:
+        shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=float, buffer=shm.buf)[:] = values
+
+            workers = processes or os.cpu_count() or 1
+            chunksize = max(1, len(tasks) // (4 * workers))
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_style,
+                                     initargs=(shm.name, values.shape)) as pool:
+                results = list(pool.map(_rbsa_task, tasks, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    weights = np.stack(results) if results else np.empty((0, len(idx), len(cols)))
+    index = pd.MultiIndex.from_product([funds, idx, cols], names=["fund", "date", "style"])
+    result = pd.Series(weights.ravel(), index=index, name="weight")
+
+    return result.dropna()
+
+
+# calc time-varying style weights of many funds by recursive least squares / Kalman filter
+@timed("models.dynamic_rbsa", "model")
+def dynamic_rbsa(rets, style, forgetting=0.99, process_var=0.0, prior_var=1e4,
+                 long_only=True, prd="d", state=None, data=None):
+    """
+    #Func:
+        calc time-varying style weights of many funds on one style suite
+        by recursive least squares with a forgetting factor (or a Kalman filter),
+        O(k^2) per fund per day instead of a window QP every day,
+        each day is labeled by itself (weights use returns up to that day)
+
+    #Params:
+        rets: returns of funds in pandas DataFrame, with date index and fund columns
+        style: returns of style indices aligned with rets in pandas DataFrame,
+               or a style suite (e.g: cni_cgv_6, "cni_cgv_6") fetched via style_rets()
+        forgetting: forgetting factor in (0, 1], e.g: 0.99 (memory of ~100 days)
+        process_var: variance of daily weight changes relative to residual variance (Kalman),
+                     0 for plain RLS
+        prior_var: variance of initial weights (equal weights) relative to residual variance
+        long_only: if True, weights are projected onto w >= 0, sum(w) = 1
+        prd: "d" weights of every day, or "w", "m", "q", "s", "y" only at period-end trading days
+        state: StyleFilter of earlier days to continue from (updated in place),
+               e.g: run on new days only, if None, start from scratch
+        data: StyleData the style suite is taken from, if None, fetched via Wind API
+
+    #Return:
+        style weights in pandas Series named "weight",
+        indexed by fund, date and style (days without enough data are dropped)
+    """
+
+    if isinstance(style, (list, str)):
+        style = style_rets(style, rets.index, data)
+
+    funds = rets.columns
+    cols = style.columns
+    x = np.asarray(style.values, dtype=float)
+    y = np.asarray(rets.values, dtype=float)
+
+    if state is None:
+        state = StyleFilter(list(funds), len(cols), forgetting, process_var, prior_var)
+
+    if prd == "d":
+        keep = np.ones(len(style), dtype=bool)
+    else:
+        days = np.asarray(pd.DatetimeIndex(style.index).values, dtype="datetime64[D]")
+        keep = np.isin(days, period_ends(prd, style.index[0], style.index[-1]))
+
+    weights = np.empty((len(funds), int(keep.sum()), len(cols)))
+    j = 0
+    for i in range(len(x)):
+        state.update(x[i], y[i])
+        if i % 250 == 249:
+            state.symmetrize()
+        if keep[i]:
+            weights[:, j] = np.asarray(state.weights(long_only))
+            j += 1
+
+    index = pd.MultiIndex.from_product([funds, style.index[keep], cols], names=["fund", "date", "style"])
+    result = pd.Series(weights.ravel(), index=index, name="weight")
+
+    return result.dropna()
+
+
 # single index model
 def single_index_model(x, benchmark):
     x = df_to_series(x)
@@ -84,6 +421,34 @@ def single_index_model(x, benchmark):
     return result_dict
 
 
+# single index model of many funds
+@timed("models.batch_single_index_model", "model")
+def batch_single_index_model(rets, benchmark):
+    """
+    #Func:
+        single index model of many funds, every column regressed on one benchmark
+        in one pass of matrix algebra, NaN masked per column
+
+    #Params:
+        rets: returns of funds, pandas DataFrame or numpy array (date x fund)
+        benchmark: returns of benchmark aligned with rets,
+                   pandas dataframe (first column), pandas series or numpy array
+
+    #Return:
+        pandas DataFrame indexed by fund, with columns
+        alpha, beta, rvalue, pvalue, stderr, alpha_stderr, nobs
+    """
+
+    benchmark = df_to_series(benchmark)
+    if isinstance(rets, pd.DataFrame) and isinstance(benchmark, pd.Series):
+        benchmark = benchmark.reindex(rets.index)
+
+    funds = rets.columns if isinstance(rets, pd.DataFrame) else None
+    result = simple_ols(np.asarray(rets, dtype=float), np.asarray(benchmark, dtype=float))
+
+    return pd.DataFrame(result, index=funds)
+
+
 # Treynor-Mazuy model(T-M model)
 def treynor_mazuy_model(r, benchmark, risk_free):
     def tm_model(r, alpha, beta, gamma):
@@ -102,3 +467,62 @@ def treynor_mazuy_model(r, benchmark, risk_free):
     }
     
     return result_dict
+
+
+# market timing models of many funds, T-M or H-M model
+@timed("models.batch_market_timing", "model")
+def batch_market_timing(rets, benchmark, risk_free=0.0, model="tm", hac_lags=None):
+    """
+    #Func:
+        market timing models of many funds by batched OLS, NaN masked per column
+        T-M model: r - rf = alpha + beta * (rm - rf) + gamma * (rm - rf)^2
+        H-M model: r - rf = alpha + beta * (rm - rf) + gamma * max(rm - rf, 0)
+
+    #Params:
+        rets: returns of funds, pandas DataFrame or numpy array (date x fund)
+        benchmark: returns of benchmark aligned with rets,
+                   pandas dataframe (first column), pandas series or numpy array
+        risk_free: risk free rate, a number or a series aligned with rets
+        model: "tm" (Treynor-Mazuy) or "hm" (Henriksson-Merton)
+        hac_lags: lags of Newey-West(HAC) standard errors, True for Newey-West rule of thumb,
+                  if None, naive OLS standard errors
+
+    #Return:
+        pandas DataFrame indexed by fund, with columns
+        alpha, beta, gamma, their stderr/tvalue/pvalue, r_sqr, nobs
+    """
+
+    benchmark = df_to_series(benchmark)
+    risk_free = df_to_series(risk_free)
+    if isinstance(rets, pd.DataFrame):
+        if isinstance(benchmark, pd.Series):
+            benchmark = benchmark.reindex(rets.index)
+        if isinstance(risk_free, pd.Series):
+            risk_free = risk_free.reindex(rets.index)
+
+    funds = rets.columns if isinstance(rets, pd.DataFrame) else None
+    risk_free = np.asarray(risk_free, dtype=float)
+    y = np.asarray(rets, dtype=float) - (risk_free[:, None] if risk_free.ndim else risk_free)
+    excess = np.asarray(benchmark, dtype=float) - risk_free
+
+    if model == "tm":
+        timing = excess * excess
+    elif model == "hm":
+        timing = np.maximum(excess, 0.0)
+    else:
+        raise ValueError("unknown market timing model: " + str(model))
+
+    x = np.column_stack([np.ones(len(excess)), excess, timing])
+    result = batch_ols(y, x, hac_lags)
+
+    df = pd.DataFrame(index=funds if funds is not None else range(y.shape[1]))
+    for i, name in enumerate(["alpha", "beta", "gamma"]):
+        df[name] = result["coef"][:, i]
+        df[name + "_stderr"] = result["stderr"][:, i]
+        df[name + "_tvalue"] = result["tvalue"][:, i]
+        df[name + "_pvalue"] = result["pvalue"][:, i]
+    df["r_sqr"] = result["rsquared"]
+    df["nobs"] = result["nobs"]
+
+    return df
+
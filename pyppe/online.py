@@ -0,0 +1,521 @@
+import numpy as np
+import pandas as pd
+
+from .periods import prds_per_year
+from .solvers import psd_projection, simplex_projection
+
+
+# trans a row of observations to a 1d float numpy array
+def _row(x):
+    return np.atleast_1d(np.asarray(x, dtype=float))
+
+
+# wrap a matrix of all columns like the input's columns
+def _wrap_matrix(a, cols):
+    if cols is None:
+        return a
+    return pd.DataFrame(a, index=cols, columns=cols)
+
+
+# base of streaming accumulators, one state per fund
+class Accumulator(object):
+    """
+    #Func:
+        base of streaming accumulators, states are numpy arrays with one value per fund,
+        serializable by to_dict()/from_dict() (JSON friendly)
+
+    #Params:
+        num: number of funds, or a list of fund codes
+    """
+
+    # names of state arrays
+    _states = []
+
+    def __init__(self, num=1):
+        if isinstance(num, (int, np.integer)):
+            self.columns = None
+        else:
+            self.columns = list(num)
+            num = len(self.columns)
+
+        self._init(num)
+
+    def _init(self, num):
+        raise NotImplementedError
+
+    # wrap a result like the accumulated rows
+    def _wrap(self, a):
+        if self.columns is None:
+            return a
+        return pd.Series(a, index=self.columns)
+
+    # return states in a dict of lists
+    def to_dict(self):
+        d = {"type":type(self).__name__, "columns":self.columns}
+        for name in self._states:
+            value = getattr(self, name)
+            d[name] = value.tolist() if isinstance(value, np.ndarray) else value
+
+        return d
+
+    # build from a dict of to_dict()
+    @classmethod
+    def from_dict(cls, d):
+        acc = cls.__new__(cls)
+        acc.columns = d.get("columns")
+        for name in cls._states:
+            value = d[name]
+            setattr(acc, name, np.asarray(value, dtype=float) if isinstance(value, list) else value)
+
+        return acc
+
+
+# streaming mean and variance of every fund (Welford)
+class MomentAccumulator(Accumulator):
+    """
+    #Func:
+        streaming mean and variance of every fund (Welford),
+        O(1) per fund per row, NaN are skipped, mergeable (Chan et al.)
+
+    #Params:
+        num: number of funds, or a list of fund codes
+    """
+
+    _states = ["n", "mean", "m2"]
+
+    def _init(self, num):
+        self.n = np.zeros(num)
+        self.mean = np.zeros(num)
+        self.m2 = np.zeros(num)
+
+    # add a row of observations, only where mask is True
+    def update(self, x, mask=None):
+        x = _row(x)
+        valid = np.isfinite(x) if mask is None else np.isfinite(x) & mask
+
+        self.n = self.n + valid
+        delta = np.where(valid, x - self.mean, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.mean = self.mean + np.where(valid, delta / self.n, 0.0)
+        self.m2 = self.m2 + np.where(valid, delta * (x - self.mean), 0.0)
+
+        return self
+
+    # add a block of rows (date x fund) at once
+    def update_block(self, x, mask=None):
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1:
+            x = x[:, None]
+        valid = np.isfinite(x) if mask is None else np.isfinite(x) & mask
+
+        block = MomentAccumulator(x.shape[1])
+        block.n = valid.sum(axis=0).astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block.mean = np.where(block.n > 0, np.where(valid, x, 0.0).sum(axis=0) / block.n, 0.0)
+        block.m2 = np.where(valid, (x - block.mean) ** 2, 0.0).sum(axis=0)
+
+        return self.merge(block)
+
+    # merge accumulated states of another accumulator
+    def merge(self, other):
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.mean = np.where(n > 0, self.mean + delta * other.n / n, 0.0)
+            self.m2 = np.where(n > 0, self.m2 + other.m2 + delta * delta * self.n * other.n / n, 0.0)
+        self.n = n
+
+        return self
+
+    # return standard deviation
+    def std(self, dof=1):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v = np.where(self.n > dof, self.m2 / (self.n - dof), np.nan)
+
+        return self._wrap(np.sqrt(v))
+
+    # return annulized standard deviation
+    def annl_std(self, period="d"):
+        return self.std() * (prds_per_year(period) ** 0.5)
+
+
+# streaming downside and upside standard deviation of every fund
+class SemiVarianceAccumulator(Accumulator):
+    """
+    #Func:
+        streaming downside and upside standard deviation of every fund,
+        the same as downside_std()/upside_std() on all rows added so far
+
+    #Params:
+        num: number of funds, or a list of fund codes
+        line: limited value
+    """
+
+    _states = ["line", "down", "up"]
+
+    def __init__(self, num=1, line=0):
+        self.line = line
+        super(SemiVarianceAccumulator, self).__init__(num)
+
+    def _init(self, num):
+        self.down = MomentAccumulator(num)
+        self.up = MomentAccumulator(num)
+
+    def update(self, x):
+        x = _row(x)
+        with np.errstate(invalid="ignore"):
+            self.down.update(x, x < self.line)
+            self.up.update(x, x > self.line)
+
+        return self
+
+    def update_block(self, x):
+        x = np.asarray(x, dtype=float)
+        with np.errstate(invalid="ignore"):
+            self.down.update_block(x, x < self.line)
+            self.up.update_block(x, x > self.line)
+
+        return self
+
+    def merge(self, other):
+        self.down.merge(other.down)
+        self.up.merge(other.up)
+
+        return self
+
+    def downside_std(self, period="d"):
+        return self._wrap(self.down.annl_std(period))
+
+    def upside_std(self, period="d"):
+        return self._wrap(self.up.annl_std(period))
+
+    def to_dict(self):
+        return {"type":type(self).__name__, "columns":self.columns, "line":self.line,
+                "down":self.down.to_dict(), "up":self.up.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        acc = cls.__new__(cls)
+        acc.columns, acc.line = d.get("columns"), d["line"]
+        acc.down = MomentAccumulator.from_dict(d["down"])
+        acc.up = MomentAccumulator.from_dict(d["up"])
+
+        return acc
+
+
+# streaming covariance of every fund with a benchmark
+class CovarianceAccumulator(Accumulator):
+    """
+    #Func:
+        streaming covariance, correlation and beta of every fund with a benchmark,
+        O(1) per fund per row on pairs both valid, mergeable
+
+    #Params:
+        num: number of funds, or a list of fund codes
+    """
+
+    _states = ["n", "mean_x", "mean_y", "m2_x", "m2_y", "c"]
+
+    def _init(self, num):
+        for name in self._states:
+            setattr(self, name, np.zeros(num))
+
+    # add a row of funds' observations x and the benchmark's observation y
+    def update(self, x, y):
+        x = _row(x)
+        y = np.broadcast_to(_row(y), x.shape)
+        valid = np.isfinite(x) & np.isfinite(y)
+
+        self.n = self.n + valid
+        dx = np.where(valid, x - self.mean_x, 0.0)
+        dy = np.where(valid, y - self.mean_y, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.mean_x = self.mean_x + np.where(valid, dx / self.n, 0.0)
+            self.mean_y = self.mean_y + np.where(valid, dy / self.n, 0.0)
+        self.m2_x = self.m2_x + np.where(valid, dx * (x - self.mean_x), 0.0)
+        self.m2_y = self.m2_y + np.where(valid, dy * (y - self.mean_y), 0.0)
+        self.c = self.c + np.where(valid, dx * (y - self.mean_y), 0.0)
+
+        return self
+
+    def merge(self, other):
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w = np.where(n > 0, self.n * other.n / n, 0.0)
+            self.mean_x = np.where(n > 0, self.mean_x + dx * other.n / n, 0.0)
+            self.mean_y = np.where(n > 0, self.mean_y + dy * other.n / n, 0.0)
+        self.m2_x = self.m2_x + other.m2_x + dx * dx * w
+        self.m2_y = self.m2_y + other.m2_y + dy * dy * w
+        self.c = self.c + other.c + dx * dy * w
+        self.n = n
+
+        return self
+
+    def cov(self, dof=1):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap(np.where(self.n > dof, self.c / (self.n - dof), np.nan))
+
+    def cor(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap(np.where(self.n > 1, self.c / np.sqrt(self.m2_x * self.m2_y), np.nan))
+
+    def r_sqr(self):
+        return self.cor() ** 2
+
+    def beta(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._wrap(np.where(self.n > 1, self.c / self.m2_y, np.nan))
+
+
+# streaming running peak, drawdown and CAGR of every fund's prices
+class DrawdownAccumulator(Accumulator):
+    """
+    #Func:
+        streaming running peak, current/max drawdown and CAGR of every fund's prices,
+        O(1) per fund per row, NaN are skipped, mergeable in date order
+
+    #Params:
+        num: number of funds, or a list of fund codes
+    """
+
+    _states = ["n", "first", "last", "peak", "low", "max_dd"]
+
+    def _init(self, num):
+        self.n = np.zeros(num)
+        for name in ["first", "last", "peak", "low"]:
+            setattr(self, name, np.full(num, np.nan))
+        self.max_dd = np.zeros(num)
+
+    # add a row of prices
+    def update(self, p):
+        p = _row(p)
+        valid = np.isfinite(p)
+
+        self.n = self.n + valid
+        self.first = np.where(np.isnan(self.first) & valid, p, self.first)
+        self.last = np.where(valid, p, self.last)
+        self.peak = np.fmax(self.peak, p)
+        self.low = np.fmin(self.low, p)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.max_dd = np.fmin(self.max_dd, p / self.peak - 1)
+
+        return self
+
+    # merge accumulated states of another accumulator of later prices
+    def merge(self, other):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cross = other.low / self.peak - 1 # peak before, low after
+        self.max_dd = np.fmin(np.fmin(self.max_dd, other.max_dd), cross)
+
+        self.n = self.n + other.n
+        self.first = np.where(np.isnan(self.first), other.first, self.first)
+        self.last = np.where(np.isnan(other.last), self.last, other.last)
+        self.peak = np.fmax(self.peak, other.peak)
+        self.low = np.fmin(self.low, other.low)
+
+        return self
+
+    def drawdown(self):
+        return self._wrap(self.last / self.peak - 1)
+
+    def maxdrawdown(self):
+        return self._wrap(np.where(self.n > 0, self.max_dd, np.nan))
+
+    # return total rate of return, the same as to_cagr_rets()
+    def cagr_rets(self):
+        return self._wrap(self.last / self.first - 1)
+
+    # return annualized rate of return
+    def annl_rets(self, period="d"):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rets = (self.last / self.first) ** (prds_per_year(period) / (self.n - 1)) - 1
+
+        return self._wrap(np.where(self.n > 1, rets, np.nan))
+
+
+# time-varying style exposures of every fund, recursive least squares / Kalman filter
+class StyleFilter(Accumulator):
+    """
+    #Func:
+        time-varying style exposures of every fund on one style suite,
+        recursive least squares with a forgetting factor, or a Kalman filter
+        with random walk exposures if process_var > 0,
+        O(k^2) per fund per row (k style indices), all funds at once,
+        a fund with NaN return is left untouched on that row
+
+        variances are in units of the observation noise variance,
+        so only forgetting, process_var and prior_var shape the estimates
+
+    #Params:
+        num: number of funds, or a list of fund codes
+        num_style: number of style indices
+        forgetting: forgetting factor in (0, 1], e.g: 0.99 (memory of ~100 rows)
+        process_var: variance of daily exposure changes (Kalman), 0 for plain RLS
+        prior_var: variance of initial exposures (equal weights)
+    """
+
+    _states = ["forgetting", "process_var", "prior_var", "n", "beta", "cov"]
+
+    def __init__(self, num=1, num_style=2, forgetting=0.99, process_var=0.0, prior_var=1e4):
+        self.num_style = num_style
+        self.forgetting = forgetting
+        self.process_var = process_var
+        self.prior_var = prior_var
+        super(StyleFilter, self).__init__(num)
+
+    def _init(self, num):
+        k = self.num_style
+        self.n = np.zeros(num)
+        self.beta = np.full((num, k), 1.0 / k)
+        self.cov = np.tile(np.eye(k) * self.prior_var, (num, 1, 1))
+
+    # add a row of style returns x and funds' returns y
+    def update(self, x, y):
+        x = _row(x)
+        y = _row(y)
+        if not np.all(np.isfinite(x)):
+            return self
+        valid = np.isfinite(y)
+        rows = slice(None) if valid.all() else np.flatnonzero(valid)
+
+        cov = self.cov[rows] * (1.0 / self.forgetting)
+        if self.process_var:
+            cov += np.eye(len(x)) * self.process_var
+
+        px = cov @ x # P x of every fund
+        gain = px / (px @ x + 1.0)[:, None]
+        err = y[rows] - self.beta[rows] @ x
+
+        self.beta[rows] += gain * err[:, None]
+        cov -= gain[:, :, None] * px[:, None, :]
+        self.cov[rows] = cov
+        self.n = self.n + valid
+
+        return self
+
+    # make covariance matrices exactly symmetric again, drops accumulated rounding errors
+    def symmetrize(self):
+        self.cov = (self.cov + self.cov.transpose(0, 2, 1)) / 2
+
+        return self
+
+    # return current exposures, NaN for funds with fewer rows than style indices
+    def weights(self, long_only=False):
+        w = np.where((self.n >= self.beta.shape[1])[:, None], self.beta, np.nan)
+        if long_only:
+            w = simplex_projection(w)
+
+        if self.columns is None:
+            return w
+        return pd.DataFrame(w, index=self.columns)
+
+    @classmethod
+    def from_dict(cls, d):
+        acc = super(StyleFilter, cls).from_dict(d)
+        acc.num_style = acc.beta.shape[-1]
+
+        return acc
+
+
+# streaming exponentially weighted covariance matrix of all funds
+class EwmaCovariance(Accumulator):
+    """
+    #Func:
+        streaming exponentially weighted covariance matrix of all funds
+        (zero mean, RiskMetrics style), O(N^2) per row from stored state,
+        a pair is updated only on rows both values are valid and
+        normalized by its own weight sum, so funds of short history are unbiased,
+        cov() projects the pairwise matrix to the nearest positive semi-definite
+        matrix (O(N^3), once per call), so it is positive semi-definite on funds
+        with at least min_periods values, serializable by to_dict()/from_dict()
+
+    #Params:
+        num: number of funds, or a list of fund codes
+        halflife: rows for a weight to halve, e.g: 60
+        decay: weight decay per row, e.g: 0.94, if given, halflife is ignored
+        min_periods: min rows of a pair both valid, pairs below it have zero
+                     covariance, funds below it have NaN rows and columns
+    """
+
+    _states = ["decay", "min_periods", "n", "m", "s", "w"]
+
+    def __init__(self, num=1, halflife=60, decay=None, min_periods=20):
+        self.decay = 0.5 ** (1.0 / halflife) if decay is None else decay
+        self.min_periods = min_periods
+        super(EwmaCovariance, self).__init__(num)
+
+    def _init(self, num):
+        self.n = np.zeros(num)
+        self.m = np.zeros((num, num)) # rows of pairs both valid
+        self.s = np.zeros((num, num)) # weighted sums of products
+        self.w = np.zeros((num, num)) # weight sums of pairs
+
+    # add a row of funds' returns
+    def update(self, x):
+        x = _row(x)
+        valid = np.isfinite(x)
+        lam = self.decay
+
+        if valid.all():
+            self.s *= lam
+            self.s += (1 - lam) * np.outer(x, x)
+            self.w *= lam
+            self.w += 1 - lam
+            self.m += 1
+        else:
+            x0 = np.where(valid, x, 0.0)
+            pair = valid[:, None] & valid[None, :]
+            self.s = np.where(pair, lam * self.s + (1 - lam) * np.outer(x0, x0), self.s)
+            self.w = np.where(pair, lam * self.w + (1 - lam), self.w)
+            self.m += pair
+        self.n = self.n + valid
+
+        return self
+
+    # add a block of rows (date x fund)
+    def update_block(self, x):
+        for row in np.asarray(x, dtype=float):
+            self.update(row)
+
+        return self
+
+    # return covariance matrix, positive semi-definite
+    def cov(self):
+        enough = (self.m >= max(self.min_periods, 1)) & (self.w > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = np.where(enough, self.s / self.w, 0.0)
+        c[np.diag_indices_from(c)] = np.where(np.diag(enough), np.diag(c), np.nan)
+
+        return _wrap_matrix(psd_projection(c), self._labels())
+
+    # return correlation coefficient matrix
+    def cor(self):
+        c = np.asarray(self.cov())
+        std = np.sqrt(np.diag(c))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return _wrap_matrix(np.clip(c / np.outer(std, std), -1.0, 1.0), self._labels())
+
+    def _labels(self):
+        return None if self.columns is None else pd.Index(self.columns)
+
+
+# build an accumulator from a dict of to_dict()
+def from_dict(d):
+    """
+    #Func:
+        build an accumulator from a dict of to_dict(), e.g: loaded from JSON
+
+    #Params:
+        d: dict with "type" of accumulator
+
+    #Return:
+        accumulator
+    """
+
+    types = {cls.__name__:cls for cls in [MomentAccumulator, SemiVarianceAccumulator,
+                                          CovarianceAccumulator, DrawdownAccumulator, StyleFilter,
+                                          EwmaCovariance]}
+
+    return types[d["type"]].from_dict(d)
@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+
+from .ragged import ffill, fill_gaps
+from .resample import period_ends
+
+
+# trans rebalance rule to sorted rebalance rows, the first row always included
+def _rebalance_rows(index, rebalance, calendar=None):
+    length = len(index)
+
+    if rebalance is None:
+        rows = np.array([0])
+    elif isinstance(rebalance, (int, np.integer)):
+        rows = np.arange(0, length, int(rebalance))
+    else:
+        days = np.asarray(pd.DatetimeIndex(index).values, dtype="datetime64[D]")
+        if isinstance(rebalance, str):
+            dates = period_ends(rebalance, days[0], days[-1], calendar)
+        else:
+            dates = np.asarray(pd.DatetimeIndex(rebalance).values, dtype="datetime64[D]")
+        # rebalance at the close of the last row on or before every date
+        rows = np.searchsorted(days, dates, side="right") - 1
+        rows = np.append(0, rows[rows >= 0])
+
+    rows = np.unique(rows)
+
+    return rows[rows < max(length - 1, 1)]
+
+
+# simulate NAV of portfolios rebalanced to target weights at rebalance rows
+def _simulate(p, rows, weights, cost=0.0):
+    """
+    #Func:
+        simulate NAV of portfolios, between two rebalance rows holdings drift
+        with prices, so NAV of a segment is one matrix product of price relatives
+        and target weights, segments are chained by their end values
+
+    #Params:
+        p: T x N prices
+        rows: R rebalance rows, sorted, the first is 0
+        weights: R x M x N target weights of every segment (M portfolios)
+        cost: transaction cost per unit of turnover at every rebalance
+
+    #Return:
+        (T x M NAV starting at 1, R x M turnover: sum of absolute weight changes)
+    """
+
+    length, num = p.shape
+    held = ffill(p) # a fund stops moving after its last price
+    avail = np.isfinite(fill_gaps(p)) # a fund can be bought inside its valid range only
+
+    m = weights.shape[1]
+    nav = np.full((length, m), np.nan)
+    turnover = np.zeros((len(rows), m))
+    value = np.ones(m)
+    drift = None
+
+    bounds = np.append(rows, length - 1)
+    for k, (s, e) in enumerate(zip(bounds[:-1], bounds[1:])):
+        # target weights renormalized over funds available at rebalance
+        w = np.where(avail[s], weights[k], 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w = w / w.sum(axis=1, keepdims=True)
+
+        if drift is not None:
+            turnover[k] = np.abs(w - drift).sum(axis=1)
+            value = value * (1 - cost * turnover[k])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = np.where(avail[s], held[s:e + 1] / held[s], 0.0) # price relatives since rebalance
+        seg = rel.dot(w.T)
+        nav[s:e + 1] = value * seg
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift = w * rel[-1] / seg[-1][:, None] # weights drifted to segment end
+        value = nav[e]
+
+    return nav, turnover
+
+
+# calc NAV of portfolios rebalanced to static target weights
+def portfolio_nav(prices, weights, rebalance="m", cost=0.0, calendar=None, return_turnover=False):
+    """
+    #Func:
+        calc NAV of FOF portfolios rebalanced to static target weights,
+        holdings drift with prices between rebalances, each segment between
+        rebalances is one matrix product for all portfolios (no daily loop),
+        so thousands of candidate weightings are evaluated in one batch,
+        weights are renormalized over funds with a price at each rebalance
+        (not incepted or liquidated funds are left out)
+
+    #Params:
+        prices: NAV of constituent funds in pandas DataFrame, date index and fund columns
+        weights: target weights, pandas Series indexed by fund or numpy array of N (one portfolio),
+                 or pandas DataFrame (candidate x fund) or numpy array of M x N (M portfolios)
+        rebalance: "w", "m", "q", "s", "y" at period-end trading days,
+                   int every [rebalance] rows, list of dates, or None buy and hold
+        cost: transaction cost per unit of turnover (sum of absolute weight changes), e.g: 0.001
+        calendar: TradingCalendar of period-end days, if None, get_calendar()
+        return_turnover: if True, also return turnover at every rebalance
+
+    #Return:
+        NAV starting at 1, pandas Series for one portfolio,
+        pandas DataFrame (date x candidate) for many, e.g: passed to perf_report()
+        (and turnover in pandas DataFrame, rebalance date x candidate, if return_turnover)
+    """
+
+    single = np.ndim(weights) == 1
+    labels = weights.index if isinstance(weights, pd.DataFrame) else None
+
+    if isinstance(weights, (pd.Series, pd.DataFrame)):
+        weights = weights.reindex(columns=prices.columns) if not single else \
+            weights.reindex(prices.columns).to_frame().T
+    w = np.nan_to_num(np.atleast_2d(np.asarray(weights, dtype=float)))
+    if w.shape[1] != prices.shape[1]:
+        raise ValueError("weights of %d funds for %d funds' prices" % (w.shape[1], prices.shape[1]))
+
+    rows = _rebalance_rows(prices.index, rebalance, calendar)
+    nav, turnover = _simulate(prices.values.astype(float), rows, np.broadcast_to(w, (len(rows),) + w.shape), cost)
+
+    cols = labels if labels is not None else pd.RangeIndex(len(w))
+    nav = pd.Series(nav[:, 0], index=prices.index, name="nav") if single else \
+        pd.DataFrame(nav, index=prices.index, columns=cols)
+    if not return_turnover:
+        return nav
+
+    turnover = pd.DataFrame(turnover, index=prices.index[rows], columns=cols)
+    return nav, (turnover[turnover.columns[0]] if single else turnover)
+
+
+# calc NAV of portfolios following weight schedules
+def schedule_nav(prices, schedule, cost=0.0, return_turnover=False, dates=None):
+    """
+    #Func:
+        calc NAV of FOF portfolios following weight schedules, rebalanced to
+        each row's weights at the close of its date, drifting with prices until the next,
+        many schedules sharing rebalance dates are evaluated in one batch
+
+    #Params:
+        prices: NAV of constituent funds in pandas DataFrame, date index and fund columns
+        schedule: target weights in pandas DataFrame, rebalance date index and fund columns
+                  (funds not in columns get no weight), one portfolio,
+                  or a list (dict of candidate -> DataFrame) of such DataFrames with the same
+                  rebalance dates, or numpy array of R x M x N (rebalance date x candidate x fund,
+                  funds in prices' columns), many portfolios
+        cost: transaction cost per unit of turnover, e.g: 0.001
+        return_turnover: if True, also return turnover at every rebalance
+        dates: rebalance dates of a numpy array schedule (R dates)
+
+    #Return:
+        NAV starting at 1 at the first rebalance date (NaN before it),
+        pandas Series for one portfolio, pandas DataFrame (date x candidate) for many
+        (and turnover in pandas Series indexed by rebalance date, or DataFrame of
+        rebalance date x candidate, if return_turnover)
+    """
+
+    single = isinstance(schedule, pd.DataFrame)
+    labels = None
+    if isinstance(schedule, np.ndarray):
+        if dates is None or len(dates) != len(schedule) or schedule.ndim != 3:
+            raise ValueError("a numpy schedule needs R x M x N weights and R dates")
+        w = np.nan_to_num(schedule.astype(float))
+    else:
+        if single:
+            schedule = [schedule]
+        elif isinstance(schedule, dict):
+            labels = pd.Index(list(schedule.keys()))
+            schedule = list(schedule.values())
+        schedule = [s.sort_index() for s in schedule]
+        dates = schedule[0].index
+        if any(not s.index.equals(dates) for s in schedule):
+            raise ValueError("schedules must share the same rebalance dates")
+        w = np.stack([np.nan_to_num(s.reindex(columns=prices.columns).values.astype(float))
+                      for s in schedule], axis=1)
+    if w.shape[2] != prices.shape[1]:
+        raise ValueError("weights of %d funds for %d funds' prices" % (w.shape[2], prices.shape[1]))
+
+    days = np.asarray(pd.DatetimeIndex(prices.index).values, dtype="datetime64[D]")
+    dates = np.asarray(pd.DatetimeIndex(dates).values, dtype="datetime64[D]")
+    order = np.argsort(dates, kind="stable")
+    dates, w = dates[order], w[order]
+
+    # rebalance at the close of the last row on or before every date, the last weights of a row win
+    rows = np.searchsorted(days, dates, side="right") - 1
+    keep = (rows >= 0) & (rows < len(days) - 1)
+    rows, w = rows[keep], w[keep]
+    rows, last = np.unique(rows[::-1], return_index=True)
+    w = w[::-1][last]
+
+    cols = labels if labels is not None else pd.RangeIndex(w.shape[1])
+    nav = pd.DataFrame(np.nan, index=prices.index, columns=cols)
+    turnover = pd.DataFrame(np.nan, index=prices.index[rows], columns=cols)
+    if len(rows):
+        start = rows[0]
+        values, turns = _simulate(prices.values[start:].astype(float), rows - start, w, cost)
+        nav.iloc[start:] = values
+        turnover[:] = turns
+
+    if single:
+        nav, turnover = nav[0].rename("nav"), turnover[0].rename("turnover")
+
+    return (nav, turnover) if return_turnover else nav
+
+
+# calc risk contributions of funds to portfolio volatility
+def risk_contrib(weights, cov, relative=False):
+    """
+    #Func:
+        calc risk contributions of funds to portfolio volatility,
+        w_i * (cov w)_i / sqrt(w' cov w), summing to the portfolio volatility
+
+    #Params:
+        weights: pandas Series indexed by fund or numpy array of N (one portfolio),
+                 or pandas DataFrame (candidate x fund) or numpy array of M x N (M portfolios)
+        cov: covariance matrix of funds, pandas DataFrame or numpy array of N x N,
+             positive semi-definite, e.g: ledoit_wolf(), ewma_cov()
+        relative: if True, contributions as fractions of portfolio volatility
+
+    #Return:
+        risk contributions like weights, zero for portfolios without risk
+    """
+
+    single = np.ndim(weights) == 1
+    if isinstance(cov, pd.DataFrame) and isinstance(weights, (pd.Series, pd.DataFrame)):
+        weights = weights.reindex(cov.index) if single else weights.reindex(columns=cov.index)
+
+    w = np.nan_to_num(np.atleast_2d(np.asarray(weights, dtype=float)))
+    c = np.asarray(cov, dtype=float)
+
+    marginal = w.dot(c)
+    vol = np.sqrt(np.clip((w * marginal).sum(axis=1), 0, None)) # round-off below zero on a PSD cov
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rc = np.where(vol[:, None] > 0, w * marginal / vol[:, None], 0.0) # no risk, no contributions
+        if relative:
+            rc = np.where(vol[:, None] > 0, rc / vol[:, None], 0.0)
+
+    if isinstance(weights, pd.Series):
+        return pd.Series(rc[0], index=weights.index, name="risk_contrib")
+    if isinstance(weights, pd.DataFrame):
+        return pd.DataFrame(rc, index=weights.index, columns=weights.columns)
+    return rc[0] if single else rc
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Wind error code of "no data"
+no_data_error = -40520007
+
+# market data provider all data access goes through, None until first use
+_provider = None
+_provider_lock = threading.Lock()
+
+
+# data returned by a provider, the same layout as WindPy's WindData
+class ProviderData(object):
+    """
+    #Func:
+        data returned by a provider, the same layout as WindPy's WindData
+
+    #Params:
+        error_code: 0 if success, Wind error code otherwise
+        codes: Wind codes
+        fields: data fields
+        times: dates in datetime.date format
+        data: list of values for each field (or code)
+    """
+
+    def __init__(self, error_code=0, codes=None, fields=None, times=None, data=None):
+        self.ErrorCode = error_code
+        self.Codes = codes or []
+        self.Fields = fields or []
+        self.Times = times or []
+        self.Data = data or []
+
+
+# market data provider interface
+class Provider(object):
+    """
+    #Func:
+        market data provider interface, the subset of WindPy's API used by pyppe
+    """
+
+    # fetch time series data of one code, ref: w.wsd
+    def wsd(self, code, fields, sdate, edate, **kwargs):
+        raise NotImplementedError
+
+    # fetch trading days from start date to end date, ref: w.tdays
+    def tdays(self, sdate, edate, **kwargs):
+        raise NotImplementedError
+
+
+# Wind API provider, started on first request
+class WindProvider(Provider):
+    """
+    #Func:
+        Wind API provider, WindPy is imported and started on first request,
+        and the session is reused by later requests of the same process
+        (a forked worker process starts its own session on its first request)
+    """
+
+    def __init__(self):
+        self._w = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # return a started Wind API
+    def api(self):
+        with self._lock:
+            if self._w is None or self._pid != os.getpid():
+                from WindPy import w
+
+                w.start()
+                self._w = w
+                self._pid = os.getpid()
+
+        return self._w
+
+    def wsd(self, code, fields, sdate, edate, **kwargs):
+        return self.api().wsd(code, fields, sdate, edate, **kwargs)
+
+    def tdays(self, sdate, edate, **kwargs):
+        return self.api().tdays(sdate, edate, **kwargs)
+
+
+# in-memory provider for tests and replay, no Wind needed
+class FakeProvider(Provider):
+    """
+    #Func:
+        in-memory provider for tests and replay, no Wind needed
+
+    #Params:
+        data: dict of Wind code -> pandas DataFrame with date index and field columns
+        calendar: trading days, if None, all dates in data (weekdays if no data)
+        latency: seconds every request sleeps, stands in for Wind's round trip
+    """
+
+    def __init__(self, data=None, calendar=None, latency=0.0):
+        self.data = {}
+        self.calendar = None if calendar is None else pd.DatetimeIndex(calendar).normalize()
+        self.latency = latency
+        self.calls = 0
+
+        for code, df in (data or {}).items():
+            self.add(code, df)
+
+    # add data of a code
+    def add(self, code, df):
+        df = df.copy()
+        df.index = pd.DatetimeIndex(df.index).normalize()
+        df.columns = [str(c).upper() for c in df.columns]
+        self.data[code.upper()] = df.sort_index()
+
+    # build from wind_series output (date index, Wind code + fields columns)
+    @classmethod
+    def from_frame(cls, df, calendar=None, latency=0.0):
+        data = {code: df[code] for code in df.columns.get_level_values(0).unique()}
+        return cls(data, calendar, latency)
+
+    # build from a directory of "<Wind code>.csv" files, e.g: written by save()
+    @classmethod
+    def from_dir(cls, path, calendar=None, latency=0.0):
+        data = {}
+        for name in os.listdir(path):
+            if name.lower().endswith(".csv"):
+                data[name[:-4]] = pd.read_csv(os.path.join(path, name), index_col=0, parse_dates=True)
+
+        return cls(data, calendar, latency)
+
+    # save data to a directory of "<Wind code>.csv" files
+    def save(self, path):
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        for code, df in self.data.items():
+            df.to_csv(os.path.join(path, code + ".csv"))
+
+    # return trading days from start date to end date
+    def _tdays(self, sdate, edate):
+        if self.calendar is not None:
+            days = self.calendar
+        elif self.data:
+            days = pd.DatetimeIndex(np.unique(np.concatenate([df.index.values for df in self.data.values()])))
+        else:
+            days = pd.bdate_range(sdate, edate)
+
+        return days[(days >= pd.Timestamp(sdate)) & (days <= pd.Timestamp(edate))]
+
+    def wsd(self, code, fields, sdate, edate, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        fields = [f.strip().upper() for f in fields]
+
+        if code.upper() not in self.data:
+            return ProviderData(no_data_error, [code], fields)
+
+        df = self.data[code.upper()]
+        df = df[(df.index >= pd.Timestamp(sdate)) & (df.index <= pd.Timestamp(edate))]
+        df = df.reindex(columns=fields)
+
+        return ProviderData(0, [code], fields, [d.date() for d in df.index],
+                            [df[f].tolist() for f in fields])
+
+    def tdays(self, sdate, edate, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        days = self._tdays(sdate, edate)
+
+        return ProviderData(0, [], [], [d.date() for d in days], [[d.to_pydatetime() for d in days]])
+
+
+# return the market data provider, a WindProvider if none is set
+def get_provider():
+    """
+    #Func:
+        return the market data provider, a WindProvider if none is set
+
+    #Return:
+        Provider
+    """
+
+    global _provider
+
+    with _provider_lock:
+        if _provider is None:
+            _provider = WindProvider()
+
+    return _provider
+
+
+# set the market data provider
+def set_provider(provider):
+    """
+    #Func:
+        set the market data provider, e.g: FakeProvider for tests and replay
+
+    #Params:
+        provider: Provider, if None, WindProvider on next use
+    """
+
+    global _provider
+
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+
+# trans x to a 2d float numpy array, a series or 1d array as one column
+def _to_2d(x, offset=0, labels=False):
+    """
+    #Func:
+        trans x to a 2d float numpy array, a series or 1d array as one column,
+        shared by matrix functions taking pandas or numpy input
+
+    #Params:
+        x: pandas DataFrame, Series or numpy array (date x fund)
+        offset: rows of x not in results, e.g: 1 for returns of prices
+        labels: if True, return date and column labels instead of a wrapping function
+
+    #Return:
+        (array, function wrapping results back like x), or
+        (array, index, columns) if labels, None for numpy input
+    """
+
+    if isinstance(x, pd.DataFrame):
+        a = x.values.astype(float)
+        if labels:
+            return a, x.index, x.columns
+        return a, lambda r: pd.DataFrame(r, index=x.index[offset:], columns=x.columns)
+    if isinstance(x, pd.Series):
+        a = x.values.astype(float)[:, None]
+        if labels:
+            return a, x.index, x.to_frame().columns
+        return a, lambda r: pd.Series(r[:, 0], index=x.index[offset:], name=x.name)
+
+    a = np.asarray(x, dtype=float)
+    single = a.ndim == 1
+    if single:
+        a = a[:, None]
+    if labels:
+        return a, None, None
+
+    return a, (lambda r: r[:, 0]) if single else (lambda r: r)
+
+
+# forward fill NaN by column (suspended NAV), leading NaN are kept
+def ffill(p):
+    rows = np.where(np.isfinite(p), np.arange(len(p))[:, None], 0)
+    rows = np.maximum.accumulate(rows, axis=0)
+
+    return p[rows, np.arange(p.shape[1])]
+
+
+# return mean of every column over masked values
+def masked_mean(x, mask, empty=np.nan):
+    """
+    #Func:
+        return mean of every column over masked values, no warning for empty columns
+
+    #Params:
+        x: T x N numpy array
+        mask: boolean array broadcastable to x, True for values to use
+        empty: mean of columns without any masked value
+
+    #Return:
+        numpy array of N
+    """
+
+    mask = np.broadcast_to(mask, x.shape)
+    n = mask.sum(axis=0)
+    s = np.where(mask, x, 0.0).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 0, s / n, empty)
+
+
+# return first and last valid row of every column
+def valid_range(x):
+    """
+    #Func:
+        return first and last valid (finite) row of every column,
+        e.g: inception and last NAV date of every fund
+
+    #Params:
+        x: T x N numpy array or pandas DataFrame
+
+    #Return:
+        (first, last) numpy arrays of N, -1 for columns without any valid value
+    """
+
+    valid = np.isfinite(np.asarray(x, dtype=float))
+    if valid.ndim == 1:
+        valid = valid[:, None]
+
+    exists = valid.any(axis=0)
+    first = np.where(exists, np.argmax(valid, axis=0), -1)
+    last = np.where(exists, len(valid) - 1 - np.argmax(valid[::-1], axis=0), -1)
+
+    return first, last
+
+
+# return mask of rows inside every column's valid range
+def range_mask(x):
+    """
+    #Func:
+        return mask of rows inside every column's valid range (first to last valid row),
+        gaps inside the range (e.g: suspended NAV) are True, rows before and after are False
+
+    #Params:
+        x: T x N numpy array or pandas DataFrame
+
+    #Return:
+        T x N boolean numpy array
+    """
+
+    first, last = valid_range(x)
+    rows = np.arange(np.shape(x)[0])[:, None]
+
+    return (rows >= first) & (rows <= last)
+
+
+# return number of rows spanned by every column's valid range
+def range_counts(x):
+    """
+    #Func:
+        return number of rows spanned by every column's valid range,
+        gaps inside the range included, the elapsed periods used for annualization
+
+    #Params:
+        x: T x N numpy array or pandas DataFrame
+
+    #Return:
+        numpy array of N, 0 for columns without any valid value
+    """
+
+    first, last = valid_range(x)
+
+    return np.where(first >= 0, last - first + 1, 0)
+
+
+# forward fill gaps inside every column's valid range
+def fill_gaps(prices):
+    """
+    #Func:
+        forward fill gaps inside every column's valid range (e.g: suspended NAV),
+        rows before inception and after the last valid price stay NaN
+
+    #Params:
+        prices: prices in pandas DataFrame, Series or numpy array (date x fund)
+
+    #Return:
+        filled prices like prices
+    """
+
+    p, wrap = _to_2d(prices)
+
+    return wrap(np.where(range_mask(p), ffill(p), np.nan))
+
+
+# return simple returns of a ragged prices matrix, moves across gaps kept
+def ragged_rets(prices, suspended="nan"):
+    """
+    #Func:
+        return simple returns of a ragged prices matrix (funds of different inception
+        and last dates, suspended NAV gaps), the move across a gap is the return
+        of the day the price is back, NaN outside every column's valid range
+
+    #Params:
+        prices: prices in pandas DataFrame, Series or numpy array (date x fund)
+        suspended: returns of suspended days inside a gap,
+                   "nan" not observations, "zero" observations of zero return
+
+    #Return:
+        simple returns like prices without the first row
+    """
+
+    if suspended not in ("nan", "zero"):
+        raise ValueError("unknown suspended: " + str(suspended))
+
+    p, wrap = _to_2d(prices, offset=1)
+    filled = np.where(range_mask(p), ffill(p), np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = filled[1:] / filled[:-1] - 1
+    if suspended == "nan":
+        r[~np.isfinite(p[1:])] = np.nan
+
+    return wrap(r)
@@ -0,0 +1,155 @@
+import numpy as np
+from scipy import stats
+
+from .ragged import masked_mean
+
+
+# regress every column of y on one regressor x, NaN masked per column
+def simple_ols(y, x):
+    """
+    #Func:
+        regress every column of y on one regressor x in one pass of matrix algebra,
+        observations with NaN in x or a column of y are dropped for that column only,
+        results per column are the same as scipy.stats.linregress(x, y[:, j])
+
+    #Params:
+        y: T x N numpy array, e.g: returns of funds
+        x: numpy array of T, e.g: returns of benchmark
+
+    #Return:
+        dict of numpy arrays of N:
+        alpha, beta, rvalue, pvalue (of beta), stderr (of beta), alpha_stderr, nobs
+    """
+
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float).ravel()
+    if y.ndim == 1:
+        y = y[:, None]
+
+    mask = np.isfinite(y) & np.isfinite(x)[:, None]
+    m = mask.astype(float)
+
+    # center data first, sums of squares lose less precision
+    xmean = masked_mean(x[:, None], np.isfinite(x)[:, None], 0.0)[0]
+    xc = np.where(np.isfinite(x), x - xmean, 0.0)
+    ycen = masked_mean(y, mask, 0.0)
+    yc = np.where(mask, y - ycen, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = m.sum(axis=0)
+        sx = m.T.dot(xc)
+        sy = yc.sum(axis=0)
+        mx = sx / n
+        my = sy / n
+
+        ssx = m.T.dot(xc * xc) - n * mx * mx
+        ssy = (yc * yc).sum(axis=0) - n * my * my
+        sxy = yc.T.dot(xc) - n * mx * my
+
+        beta = sxy / ssx
+        alpha = my + ycen - beta * (mx + xmean)
+        rvalue = np.clip(sxy / np.sqrt(ssx * ssy), -1.0, 1.0)
+
+        dof = n - 2
+        tvalue = rvalue * np.sqrt(dof / ((1.0 - rvalue) * (1.0 + rvalue)))
+        pvalue = 2 * stats.t.sf(np.abs(tvalue), dof)
+        stderr = np.sqrt((1 - rvalue ** 2) * ssy / ssx / dof)
+        alpha_stderr = stderr * np.sqrt(ssx / n + (mx + xmean) ** 2)
+
+    return {
+        "alpha":alpha,
+        "beta":beta,
+        "rvalue":rvalue,
+        "pvalue":pvalue,
+        "stderr":stderr,
+        "alpha_stderr":alpha_stderr,
+        "nobs":n
+    }
+
+
+# return Newey-West lags by rule of thumb, floor(4 * (T / 100) ^ (2 / 9))
+def newey_west_lags(nobs):
+    return int(np.floor(4 * (nobs / 100.0) ** (2.0 / 9.0)))
+
+
+# regress every column of y on the same regressors x, NaN masked per column
+def batch_ols(y, x, hac_lags=None):
+    """
+    #Func:
+        regress every column of y on the same regressors x in one pass of matrix algebra,
+        observations with NaN in x or a column of y are dropped for that column only
+
+    #Params:
+        y: T x N numpy array, e.g: returns of funds
+        x: T x k numpy array of regressors, include a column of ones for intercept
+        hac_lags: lags of Newey-West(HAC) standard errors, True for Newey-West rule of thumb,
+                  if None, naive OLS standard errors
+
+    #Return:
+        dict of numpy arrays: coef, stderr, tvalue, pvalue (N x k),
+        rsquared, nobs (N), resid (T x N, 0 where dropped)
+    """
+
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    if y.ndim == 1:
+        y = y[:, None]
+    if x.ndim == 1:
+        x = x[:, None]
+
+    num_x = x.shape[1]
+    mask = np.isfinite(y) & np.all(np.isfinite(x), axis=1)[:, None]
+    m = mask.astype(float)
+    x0 = np.where(np.isfinite(x), x, 0.0)
+    y0 = np.where(mask, y, 0.0)
+
+    # per column Gram matrices X'MX, all columns in one matrix product
+    outer = (x0[:, :, None] * x0[:, None, :]).reshape(len(x0), -1)
+    gram = m.T.dot(outer).reshape(-1, num_x, num_x)
+    xty = x0.T.dot(y0).T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = m.sum(axis=0)
+        dof = n - num_x
+        usable = dof > 0
+        gram[~usable] = np.eye(num_x)
+        gram_inv = np.linalg.inv(gram)
+        coef = np.einsum("npq,nq->np", gram_inv, xty)
+
+        resid = np.where(mask, y0 - x0.dot(coef.T), 0.0)
+        ssr = (resid * resid).sum(axis=0)
+        ycen = np.where(mask, y0 - y0.sum(axis=0) / n, 0.0)
+        rsquared = 1 - ssr / (ycen * ycen).sum(axis=0)
+
+        if hac_lags is None:
+            cov = gram_inv * (ssr / dof)[:, None, None]
+        else:
+            lags = newey_west_lags(len(y)) if hac_lags is True else int(hac_lags)
+
+            # scores u_t = x_t * e_t, N x T x k
+            u = x0.T[None, :, :] * resid.T[:, None, :]
+            u = u.transpose(0, 2, 1)
+            meat = np.matmul(u.transpose(0, 2, 1), u)
+            for lag in range(1, lags + 1):
+                gamma = np.matmul(u[:, lag:, :].transpose(0, 2, 1), u[:, :-lag, :])
+                meat += (1 - lag / (lags + 1.0)) * (gamma + gamma.transpose(0, 2, 1))
+
+            cov = np.matmul(np.matmul(gram_inv, meat), gram_inv) * (n / dof)[:, None, None]
+
+        stderr = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+        tvalue = coef / stderr
+        pvalue = 2 * stats.t.sf(np.abs(tvalue), dof[:, None])
+
+    for a in [coef, stderr, tvalue, pvalue]:
+        a[~usable] = np.nan
+    rsquared[~usable] = np.nan
+
+    return {
+        "coef":coef,
+        "stderr":stderr,
+        "tvalue":tvalue,
+        "pvalue":pvalue,
+        "rsquared":rsquared,
+        "nobs":n,
+        "resid":resid
+    }
@@ -0,0 +1,33 @@
+from .frame import PerformanceFrame
+
+
+# calc standard performance metrics of every column in one pass
+def perf_report(prices=None, rets=None, period="d", line=0, suspended=None):
+    """
+    #Func:
+        calc standard performance metrics of every column in one vectorized pass,
+        shared reductions (sums, sums of squares, masked downside/upside sums,
+        log growth and running peaks) are computed once for all metrics
+        by PerformanceFrame, NaN are skipped per column
+
+    #Params:
+        prices: prices series in pandas dataframe or numpy array (date x fund)
+        rets: simple returns series in pandas dataframe or numpy array (date x fund),
+              if None, returns of prices
+        period: freq of series (daily, weekly, monthly...)
+        line: limited value of downside/upside standard deviation
+        suspended: None, returns as given (NaN prices drop returns on both sides),
+                   or handling of a ragged universe (different inception dates, suspended NAV):
+                   "nan" moves across gaps are kept, suspended days are not observations,
+                   "zero" suspended days are observations of zero return,
+                   either way annl_rets is annualized by periods elapsed in every column's range
+
+    #Return:
+        pandas DataFrame indexed by fund, with columns
+        nobs, arith_avg, geo_avg, median, std, annl_std, downside_std, upside_std,
+        cagr_rets (total return as to_cagr_rets), annl_rets, max_drawdown
+    """
+
+    pf = PerformanceFrame(prices=prices, rets=rets, period=period, suspended=suspended)
+
+    return pf.report(line=line)
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from .periods import prds_per_year
+from .ragged import fill_gaps
+from .tdays import get_calendar, to_date
+
+
+# trans a date index to datetime64[D] array
+def _to_days(index):
+    return np.asarray(pd.DatetimeIndex(pd.to_datetime(index)).values, dtype="datetime64[D]")
+
+
+# return period-end trading days from start date to end date
+def period_ends(prd, sdate=None, edate=None, calendar=None):
+    """
+    #Func:
+        return period-end trading days (the last trading day of every week, month...)
+        from start date to end date, from the grid cached with the calendar
+
+    #Params:
+        prd: "d", "w", "m", "q", "s", "y"
+        sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+                      if None, the first/last day of calendar
+        calendar: TradingCalendar, if None, get_calendar()
+
+    #Return:
+        numpy array of datetime64[D]
+    """
+
+    calendar = get_calendar() if calendar is None else calendar
+    ends = calendar.dates[calendar.period_ends(prd)]
+
+    spos = 0 if sdate is None else np.searchsorted(ends, np.datetime64(to_date(sdate), "D"), side="left")
+    epos = len(ends) if edate is None else np.searchsorted(ends, np.datetime64(to_date(edate), "D"), side="right")
+
+    return ends[spos:epos]
+
+
+# resample prices to period-end prices
+def resample_prices(prices, prd="m", calendar=None, partial=False):
+    """
+    #Func:
+        resample prices (e.g: daily NAV of many funds) to period-end prices
+        on the trading calendar by one gather of all columns,
+        the price of a period end is the last valid price on or before it,
+        NaN before a column's first and after its last valid price
+
+    #Params:
+        prices: pandas DataFrame or Series with date index
+        prd: "w", "m", "q", "s", "y"
+        calendar: TradingCalendar, if None, get_calendar()
+        partial: if True, also keep the first and last date of prices
+                 when they are not period ends (partial first/last period)
+
+    #Return:
+        period-end prices like prices, indexed by period-end dates
+    """
+
+    series = isinstance(prices, pd.Series)
+    df = prices.to_frame() if series else prices
+
+    days = _to_days(df.index)
+    values = np.asarray(df.values, dtype=float)
+    if not len(days):
+        return prices.iloc[:0]
+
+    ends = period_ends(prd, days[0], days[-1], calendar)
+    if partial:
+        ends = np.union1d(ends, days[[0, -1]])
+
+    # rows of last date on or before every period end
+    rows = np.searchsorted(days, ends, side="right") - 1
+
+    res = pd.DataFrame(fill_gaps(values)[rows], index=pd.DatetimeIndex(ends), columns=df.columns)
+
+    return res[res.columns[0]] if series else res
+
+
+# resample prices to period returns
+def resample_rets(prices, prd="m", calendar=None, partial=False):
+    """
+    #Func:
+        resample prices (e.g: daily NAV of many funds) to period returns
+        between consecutive period-end prices on the trading calendar
+
+    #Params:
+        prices: pandas DataFrame or Series with date index
+        prd: "w", "m", "q", "s", "y"
+        calendar: TradingCalendar, if None, get_calendar()
+        partial: if True, returns of partial first/last period are kept
+
+    #Return:
+        period returns like prices, indexed by period-end dates
+    """
+
+    p = resample_prices(prices, prd, calendar, partial)
+
+    return (p / p.shift(1) - 1).iloc[1:]
+
+
+# return number of periods in every calendar year
+def periods_per_year(prd, calendar=None):
+    """
+    #Func:
+        return number of periods (e.g: trading days, weeks) in every calendar year
+
+    #Params:
+        prd: "d", "w", "m", "q", "s", "y"
+        calendar: TradingCalendar, if None, get_calendar()
+
+    #Return:
+        pandas Series indexed by year
+    """
+
+    calendar = get_calendar() if calendar is None else calendar
+
+    return calendar.periods_per_year(prd)
+
+
+# return annualization factor of a span of dates
+def annl_factor(prd, sdate=None, edate=None, calendar=None):
+    """
+    #Func:
+        return annualization factor (periods per year) of a span of dates,
+        the mean of exact per-year counts of years the span touches,
+        years only partially covered by calendar are left out
+
+    #Params:
+        prd: "d", "w", "m", "q", "s", "y"
+        sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+                      if None, the whole calendar
+        calendar: TradingCalendar, if None, get_calendar()
+
+    #Return:
+        float, prds_per_year(prd) if no full year in calendar
+    """
+
+    calendar = get_calendar() if calendar is None else calendar
+    counts = calendar.periods_per_year(prd)
+    if not len(counts):
+        return float(prds_per_year(prd))
+
+    # drop first/last year of calendar unless they are fully covered
+    first, last = calendar.first, calendar.last
+    if (first.month, first.day) > (1, 7):
+        counts = counts.iloc[1:]
+    if (last.month, last.day) < (12, 24):
+        counts = counts.iloc[:-1]
+
+    syear = counts.index.min() if sdate is None else to_date(sdate).year
+    eyear = counts.index.max() if edate is None else to_date(edate).year
+    counts = counts[(counts.index >= syear) & (counts.index <= eyear)]
+    if not len(counts):
+        return float(prds_per_year(prd))
+
+    return float(counts.mean())
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+
+from .periods import prds_per_year, tdays_per_prd
+from .ragged import _to_2d, masked_mean
+
+
+# trans window to a number of observations, e.g: "m" -> 21
+def to_window(window):
+    if isinstance(window, str):
+        n = tdays_per_prd(window)
+        if n is None:
+            raise ValueError("unknown window: " + window)
+        return n
+
+    return int(window)
+
+
+# return sums over trailing windows of [window] rows, NaN for the first window - 1 rows
+def _rolling_sum(a, window):
+    csum = np.zeros((len(a) + 1,) + a.shape[1:])
+    np.cumsum(a, axis=0, out=csum[1:])
+
+    out = np.full(a.shape, np.nan)
+    out[window - 1:] = csum[window:] - csum[:len(a) - window + 1]
+
+    return out
+
+
+# return rolling count, sum and sum of squares of masked and centered values
+def _rolling_moments(x, mask, window):
+    xc = np.where(mask, x - masked_mean(x, mask, 0.0), 0.0)
+
+    n = _rolling_sum(mask.astype(float), window)
+    s1 = _rolling_sum(xc, window)
+    s2 = _rolling_sum(xc * xc, window)
+
+    return n, s1, s2
+
+
+# return standard deviation from count, sum and sum of squares
+def _moments_to_std(n, s1, s2, dof, min_count):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v = (s2 - s1 * s1 / n) / (n - dof)
+
+    v = np.where((n >= min_count) & (n > dof), np.clip(v, 0, None), np.nan)
+
+    return np.sqrt(v)
+
+
+# calc rolling standard deviation of series x
+def rolling_std(x, window, dof=1, min_periods=None):
+    """
+    #Func:
+        calc rolling standard deviation of series x on trailing windows,
+        O(n) per column by cumulative sums, independent of window size
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        window: window in observations, or "w", "m", "q", "s", "y"
+        dof: degree of freedom
+        min_periods: min valid observations in a window, if None, the whole window
+
+    #Return:
+        rolling standard deviation, the same shape as x
+    """
+
+    window = to_window(window)
+    min_periods = window if min_periods is None else min_periods
+    a, wrap = _to_2d(x)
+
+    n, s1, s2 = _rolling_moments(a, np.isfinite(a), window)
+
+    return wrap(_moments_to_std(n, s1, s2, dof, min_periods))
+
+
+# calc rolling annulized standard deviation of series x
+def rolling_annl_std(x, window, period="d", min_periods=None):
+    """
+    #Func:
+        calc rolling annulized standard deviation of series x on trailing windows
+        e.g: returns series
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        window: window in observations, or "w", "m", "q", "s", "y"
+        period: freq of series x (daily, weekly, monthly...)
+        min_periods: min valid observations in a window, if None, the whole window
+
+    #Return:
+        rolling annulized standard deviation, the same shape as x
+    """
+
+    n = prds_per_year(period)
+    if n is None:
+        return None
+
+    return rolling_std(x, window, min_periods=min_periods) * (n ** 0.5)
+
+
+# calc rolling standard deviation of elements above or under a line
+def _rolling_side_std(x, window, period, line, side, min_periods):
+    n = prds_per_year(period)
+    if n is None:
+        return None
+
+    window = to_window(window)
+    min_periods = window if min_periods is None else min_periods
+    a, wrap = _to_2d(x)
+
+    valid = np.isfinite(a)
+    with np.errstate(invalid="ignore"):
+        mask = valid & ((a < line) if side == "down" else (a > line))
+
+    count, s1, s2 = _rolling_moments(a, mask, window)
+    side_std = _moments_to_std(count, s1, s2, 1, 0)
+    side_std[_rolling_sum(valid.astype(float), window) < min_periods] = np.nan
+
+    return wrap(side_std * (n ** 0.5))
+
+
+# calc rolling downside standard deviation of series x
+def rolling_downside_std(x, window, period="d", line=0, min_periods=None):
+    """
+    #Func:
+        calc rolling downside standard deviation of series x on trailing windows,
+        the same as downside_std() on every window, by masked cumulative sums
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        window: window in observations, or "w", "m", "q", "s", "y"
+        period: freq of series x (daily, weekly, monthly...)
+        line: limited value
+        min_periods: min valid observations in a window, if None, the whole window
+
+    #Return:
+        rolling downside standard deviation, the same shape as x
+    """
+
+    return _rolling_side_std(x, window, period, line, "down", min_periods)
+
+
+# calc rolling upside standard deviation of series x
+def rolling_upside_std(x, window, period="d", line=0, min_periods=None):
+    """
+    #Func:
+        calc rolling upside standard deviation of series x on trailing windows,
+        the same as upside_std() on every window, by masked cumulative sums
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        window: window in observations, or "w", "m", "q", "s", "y"
+        period: freq of series x (daily, weekly, monthly...)
+        line: limited value
+        min_periods: min valid observations in a window, if None, the whole window
+
+    #Return:
+        rolling upside standard deviation, the same shape as x
+    """
+
+    return _rolling_side_std(x, window, period, line, "up", min_periods)
+
+
+# calc rolling correlation coefficient of series x and series y
+def rolling_cor(x, y, window, min_periods=None):
+    """
+    #Func:
+        calc rolling correlation coefficient of every column of x and series y
+        on trailing windows, by cumulative sums
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        y: pandas dataframe (first column), pandas series or numpy array, e.g: benchmark
+        window: window in observations, or "w", "m", "q", "s", "y"
+        min_periods: min valid pairs in a window, if None, the whole window
+
+    #Return:
+        rolling correlation coefficient, the same shape as x
+    """
+
+    window = to_window(window)
+    min_periods = window if min_periods is None else min_periods
+    a, wrap = _to_2d(x)
+
+    if isinstance(y, pd.DataFrame):
+        y = y[y.columns[0]]
+    if isinstance(y, pd.Series) and isinstance(x, (pd.DataFrame, pd.Series)):
+        y = y.reindex(x.index)
+    b = np.asarray(y, dtype=float).ravel()[:, None]
+
+    mask = np.isfinite(a) & np.isfinite(b)
+    ac = np.where(mask, a - masked_mean(a, np.isfinite(a), 0.0), 0.0)
+    bc = np.where(mask, b - masked_mean(b, np.isfinite(b), 0.0), 0.0)
+
+    n = _rolling_sum(mask.astype(float), window)
+    sa, sb = _rolling_sum(ac, window), _rolling_sum(bc, window)
+    saa, sbb = _rolling_sum(ac * ac, window), _rolling_sum(bc * bc, window)
+    sab = _rolling_sum(ac * bc, window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sab - sa * sb / n
+        va = saa - sa * sa / n
+        vb = sbb - sb * sb / n
+        cor = np.clip(cov / np.sqrt(va * vb), -1.0, 1.0)
+
+    cor[~(n >= max(min_periods, 2))] = np.nan
+
+    return wrap(cor)
+
+
+# calc rolling coefficient of determination of series x and series y
+def rolling_r_sqr(x, y, window, min_periods=None):
+    """
+    #Func:
+        calc rolling coefficient of determination of every column of x and series y
+        on trailing windows
+
+    #Params:
+        x: pandas dataframe, pandas series or numpy array (date x fund)
+        y: pandas dataframe (first column), pandas series or numpy array, e.g: benchmark
+        window: window in observations, or "w", "m", "q", "s", "y"
+        min_periods: min valid pairs in a window, if None, the whole window
+
+    #Return:
+        rolling coefficient of determination, the same shape as x
+    """
+
+    return rolling_cor(x, y, window, min_periods) ** 2
+
+
+# calc rolling max drawdown of prices series
+def rolling_maxdrawdown(prices, window):
+    """
+    #Func:
+        calc rolling max drawdown of prices series on trailing windows,
+        O(n) per column independent of window size: rows are cut into blocks of
+        [window] rows, a window is a suffix of one block plus a prefix of the next,
+        and running maxima/minima/drawdowns of all prefixes and suffixes
+        are accumulated once (van Herk/Gil-Werman)
+
+    #Params:
+        prices: prices series in pandas dataframe, pandas series or numpy array (date x fund)
+        window: window in observations, or "w", "m", "q", "s", "y"
+
+    #Return:
+        rolling max drawdown (<= 0), the same shape as prices,
+        NaN for windows with NaN prices
+    """
+
+    window = to_window(window)
+    p, wrap = _to_2d(prices)
+    length, num = p.shape
+
+    out = np.full(p.shape, np.nan)
+    if length < window:
+        return wrap(out)
+
+    # pad rows to whole blocks
+    num_blocks = -(-length // window)
+    padded = np.full((num_blocks * window, num), np.nan)
+    padded[:length] = p
+    blocks = padded.reshape(num_blocks, window, num)
+
+    with np.errstate(invalid="ignore"):
+        # prefix: running max, running min, max drawdown from block start
+        pre_max = np.maximum.accumulate(blocks, axis=1)
+        pre_min = np.minimum.accumulate(blocks, axis=1)
+        pre_dd = np.minimum.accumulate(blocks / pre_max - 1, axis=1)
+
+        # suffix: max, min, max drawdown to block end
+        rev = blocks[:, ::-1]
+        suf_max = np.maximum.accumulate(rev, axis=1)[:, ::-1]
+        suf_min = np.minimum.accumulate(rev, axis=1)[:, ::-1]
+        suf_dd = np.minimum.accumulate((suf_min / blocks - 1)[:, ::-1], axis=1)[:, ::-1]
+
+        pre_min, pre_dd = pre_min.reshape(-1, num), pre_dd.reshape(-1, num)
+        suf_max, suf_dd = suf_max.reshape(-1, num), suf_dd.reshape(-1, num)
+
+        # window [s, t]: suffix of s's block, then prefix of t's block
+        t = np.arange(window - 1, length)
+        s = t - window + 1
+        cross = np.minimum(np.minimum(suf_dd[s], pre_dd[t]), pre_min[t] / suf_max[s] - 1)
+        aligned = (s % window == 0)[:, None]
+        out[t] = np.where(aligned, pre_dd[t], cross)
+
+    return wrap(out)
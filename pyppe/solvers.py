@@ -0,0 +1,189 @@
+import numpy as np
+
+from .instrument import clock, record
+
+
+# solve min ||Xw - y||^2, s.t. w >= 0, sum(w) = 1 by its normal equations
+def simplex_lsq(gram, xty, w0=None, tol=1e-10, max_iter=None):
+    """
+    #Func:
+        solve long-only, fully-invested least squares min ||Xw - y||^2,
+        s.t. w >= 0, sum(w) = 1, by a primal active-set method on
+        its normal equations (Gram matrix X'X and X'y)
+
+    #Params:
+        gram: X'X, k x k numpy array
+        xty: X'y, numpy array of k
+        w0: warm start weights, e.g: the previous window's solution, if None, equal weights
+        tol: tolerance of weights and multipliers
+        max_iter: max active-set iterations, if None, 10 * k
+
+    #Return:
+        (weights, iterations)
+    """
+
+    start = clock()
+    k = len(xty)
+    max_iter = 10 * k if max_iter is None else max_iter
+    converged = False
+
+    # start from a feasible point
+    if w0 is None or not np.all(np.isfinite(w0)) or np.sum(np.clip(w0, 0, None)) <= tol:
+        w = np.full(k, 1.0 / k)
+    else:
+        w = np.clip(np.asarray(w0, dtype=float), 0, None)
+        w = w / w.sum()
+    free = w > tol
+
+    it = 0
+    while it < max_iter:
+        it += 1
+
+        # equality constrained solution on free set: [G 1; 1' 0] [z; nu] = [c; 1]
+        idx = np.flatnonzero(free)
+        n = len(idx)
+        kkt = np.zeros((n + 1, n + 1))
+        kkt[:n, :n] = gram[np.ix_(idx, idx)]
+        kkt[:n, n] = 1.0
+        kkt[n, :n] = 1.0
+        rhs = np.append(xty[idx], 1.0)
+        try:
+            sol = np.linalg.solve(kkt, rhs)
+        except np.linalg.LinAlgError:
+            sol = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+        z, nu = sol[:n], sol[n]
+
+        if np.all(z >= -tol):
+            w = np.zeros(k)
+            w[idx] = np.clip(z, 0, None)
+
+            # multipliers of bound constraints not in free set
+            lam = gram.dot(w) - xty + nu
+            lam[free] = 0.0
+            i = np.argmin(lam)
+            if lam[i] >= -tol * max(1.0, np.abs(xty).max()):
+                converged = True
+                break
+            free[i] = True
+        else:
+            # step towards z until a weight hits zero
+            wi = w[idx]
+            ratio = np.full(n, np.inf)
+            neg = z < -tol
+            ratio[neg] = wi[neg] / (wi[neg] - z[neg])
+            j = np.argmin(ratio)
+            wi = wi + ratio[j] * (z - wi)
+            wi[j] = 0.0
+            w = np.zeros(k)
+            w[idx] = wi
+            free = w > tol
+            w[~free] = 0.0
+
+    record("solver.simplex_lsq", "solver", start, iterations=it, converged=converged)
+
+    return w / w.sum(), it
+
+
+# project every row onto the simplex w >= 0, sum(w) = 1
+def simplex_projection(v):
+    """
+    #Func:
+        project every row onto the simplex w >= 0, sum(w) = 1 (Euclidean, sort based),
+        rows with NaN give NaN
+
+    #Params:
+        v: numpy array of k, or n x k
+
+    #Return:
+        projected numpy array like v
+    """
+
+    v = np.asarray(v, dtype=float)
+    rows = np.atleast_2d(v)
+    k = rows.shape[1]
+
+    u = -np.sort(-rows, axis=1)
+    css = np.cumsum(u, axis=1) - 1
+    with np.errstate(invalid="ignore"):
+        cond = u - css / np.arange(1, k + 1) > 0
+    rho = k - 1 - np.argmax(cond[:, ::-1], axis=1) # last index meeting cond
+    theta = css[np.arange(len(rows)), rho] / (rho + 1)
+    w = np.maximum(rows - theta[:, None], 0)
+
+    return w.reshape(v.shape)
+
+
+# project a symmetric matrix onto the nearest positive semi-definite matrix
+def psd_projection(a):
+    """
+    #Func:
+        project a symmetric matrix (e.g: covariance of pairwise complete moments)
+        onto the nearest positive semi-definite matrix (Frobenius norm) by clipping
+        negative eigenvalues to zero, rows and columns with NaN on the diagonal are
+        left out and stay NaN, other non-finite values are taken as zero
+
+    #Params:
+        a: numpy array of n x n
+
+    #Return:
+        projected numpy array of n x n
+    """
+
+    a = np.asarray(a, dtype=float)
+    ok = np.isfinite(np.diag(a))
+    out = np.full(a.shape, np.nan)
+    if not ok.any():
+        return out
+
+    sub = np.ix_(ok, ok)
+    b = np.where(np.isfinite(a[sub]), a[sub], 0.0)
+    vals, vecs = np.linalg.eigh((b + b.T) / 2)
+    out[sub] = (vecs * np.clip(vals, 0, None)).dot(vecs.T)
+
+    return out
+
+
+# long-only, fully-invested style weights on a sliding window
+class RollingStyleLSQ(object):
+    """
+    #Func:
+        long-only, fully-invested style weights on a sliding window,
+        keeps X'X and X'y of the window with rank-one add/remove updates,
+        and warm-starts every solve from the previous window's weights
+
+    #Params:
+        num_style: number of style indices
+    """
+
+    def __init__(self, num_style):
+        self.gram = np.zeros((num_style, num_style))
+        self.xty = np.zeros(num_style)
+        self.count = 0 # observations in window
+        self.weights = None
+        self.iterations = 0
+
+    # add an observation to window, rows with NaN are ignored
+    def add(self, x, y):
+        if np.isfinite(y) and np.all(np.isfinite(x)):
+            self.gram += np.outer(x, x)
+            self.xty += x * y
+            self.count += 1
+
+    # remove an observation from window, rows with NaN are ignored
+    def remove(self, x, y):
+        if np.isfinite(y) and np.all(np.isfinite(x)):
+            self.gram -= np.outer(x, x)
+            self.xty -= x * y
+            self.count -= 1
+
+    # rebuild X'X and X'y from a window's rows, drops accumulated rounding errors
+    def reset(self, style, rets):
+        valid = np.isfinite(rets) & np.all(np.isfinite(style), axis=1)
+        self.gram = style[valid].T.dot(style[valid])
+        self.xty = style[valid].T.dot(rets[valid])
+        self.count = int(valid.sum())
+
+    # solve style weights of current window
+    def solve(self):
+        self.weights, self.iterations = simplex_lsq(self.gram, self.xty, self.weights)
+        return self.weights
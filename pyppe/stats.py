@@ -3,7 +3,6 @@ import numpy as np
 import pandas as pd
 from scipy import stats
 from scipy.optimize import curve_fit
-from WindPy import *
 
 from .periods import prds_per_year
 
@@ -269,6 +268,135 @@ def r_sqr(x, y):
     return cor(x, y) ** 2
 
 
+# return pairwise complete moments of column blocks xi and xj
+def _pairwise_moments(xi, xj):
+    mi, mj = np.isfinite(xi), np.isfinite(xj)
+    xi0, xj0 = np.where(mi, xi, 0.0), np.where(mj, xj, 0.0)
+    mi, mj = mi.astype(float), mj.astype(float)
+
+    n = mi.T.dot(mj) # pairs
+    si = xi0.T.dot(mj) # sum of xi over pairs
+    sj = mi.T.dot(xj0) # sum of xj over pairs
+    sij = xi0.T.dot(xj0)
+    sii = (xi0 * xi0).T.dot(mj)
+    sjj = mi.T.dot(xj0 * xj0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cij = sij - si * sj / n
+        cii = sii - si * si / n
+        cjj = sjj - sj * sj / n
+
+    return n, cij, cii, cjj
+
+
+# calc a pairwise matrix of all columns of x, block by block
+def _pairwise_matrix(x, stat, min_periods, block_size, out):
+    if isinstance(x, pd.Series):
+        x = x.to_frame()
+    cols = x.columns if isinstance(x, pd.DataFrame) else None
+
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = x[:, None]
+
+    # center columns first, sums of squares lose less precision
+    count = np.isfinite(x).sum(axis=0)
+    x = x - np.nansum(x, axis=0) / np.maximum(count, 1)
+
+    num = x.shape[1]
+    block_size = num if block_size is None else block_size
+    out = np.empty((num, num)) if out is None else out
+
+    for i in range(0, num, block_size):
+        for j in range(i, num, block_size):
+            xi, xj = x[:, i:i+block_size], x[:, j:j+block_size]
+            n, cij, cii, cjj = _pairwise_moments(xi, xj)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                block = stat(n, cij, cii, cjj)
+            block[n < max(min_periods, 2)] = np.nan
+
+            out[i:i+block_size, j:j+block_size] = block
+            out[j:j+block_size, i:i+block_size] = block.T
+
+    if cols is not None:
+        return pd.DataFrame(out, index=cols, columns=cols)
+    return out
+
+
+# calc covariance matrix of all columns of x
+# e.g: returns of funds
+def cov_matrix(x, dof=1, min_periods=2, block_size=None, out=None):
+    """
+    #Func:
+    calc covariance matrix of all columns of x in BLAS-backed matrix products,
+    each pair uses the dates both columns are valid (pairwise complete)
+    e.g: returns of funds
+    
+    #Params:
+    x: pandas dataframe or numpy array (date x fund)
+    dof: degree of freedom
+    min_periods: min valid pairs, NaN below it
+    block_size: columns per block, bounds memory of intermediates, if None, one block
+    out: N x N numpy array (e.g: np.memmap) to write into, if None, a new array
+
+    #Return:
+    covariance matrix in pandas DataFrame (numpy array for numpy input)
+    """
+
+    stat = lambda n, cij, cii, cjj: cij / (n - dof)
+
+    return _pairwise_matrix(x, stat, min_periods, block_size, out)
+
+
+# calc correlation coefficient matrix of all columns of x
+# e.g: returns of funds
+def cor_matrix(x, min_periods=2, block_size=None, out=None):
+    """
+    #Func:
+    calc correlation coefficient matrix of all columns of x in BLAS-backed matrix products,
+    each pair uses the dates both columns are valid (pairwise complete)
+    e.g: returns of funds
+    
+    #Params:
+    x: pandas dataframe or numpy array (date x fund)
+    min_periods: min valid pairs, NaN below it
+    block_size: columns per block, bounds memory of intermediates, if None, one block
+    out: N x N numpy array (e.g: np.memmap) to write into, if None, a new array
+
+    #Return:
+    correlation coefficient matrix in pandas DataFrame (numpy array for numpy input)
+    """
+
+    stat = lambda n, cij, cii, cjj: np.clip(cij / np.sqrt(cii * cjj), -1.0, 1.0)
+
+    return _pairwise_matrix(x, stat, min_periods, block_size, out)
+
+
+# calc coefficient of determination matrix of all columns of x
+# e.g: returns of funds
+def r_sqr_matrix(x, min_periods=2, block_size=None, out=None):
+    """
+    #Func:
+    calc coefficient of determination matrix of all columns of x,
+    each pair uses the dates both columns are valid (pairwise complete)
+    e.g: returns of funds
+    
+    #Params:
+    x: pandas dataframe or numpy array (date x fund)
+    min_periods: min valid pairs, NaN below it
+    block_size: columns per block, bounds memory of intermediates, if None, one block
+    out: N x N numpy array (e.g: np.memmap) to write into, if None, a new array
+
+    #Return:
+    coefficient of determination matrix in pandas DataFrame (numpy array for numpy input)
+    """
+
+    stat = lambda n, cij, cii, cjj: np.clip(cij * cij / (cii * cjj), 0.0, 1.0)
+
+    return _pairwise_matrix(x, stat, min_periods, block_size, out)
+
+
 # return the elements above a paticular value in series x
 def upside(x, line=0):
     """
@@ -391,7 +519,7 @@ def to_simple_rets(prices):
     else:
         # assume np.ndarray
         prices_dif = np.diff(prices, axis=0)
-        rets = np.divide(prices_dif, p[:-1])
+        rets = np.divide(prices_dif, prices[:-1])
 
     return rets
 
@@ -454,7 +582,7 @@ def prices_to_drawdown(prices):
     """
 
     roll_max = np.maximum.accumulate(prices)
-    dd = p / roll_max - 1
+    dd = prices / roll_max - 1
 
     return dd
 
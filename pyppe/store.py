@@ -0,0 +1,208 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from .tdays import get_calendar, to_date
+
+
+# columnar store of date x code arrays on disk, opened by np.memmap
+class NavStore(object):
+    """
+    #Func:
+        columnar store of NAV (or any field) on disk, one contiguous
+        date x code array per field aligned to trading calendar,
+        opened by np.memmap so workers open the whole universe instantly
+        and only touch the pages they read
+
+        layout: [path]/meta.json and [path]/[FIELD].bin (C order, dates are rows)
+
+    #Params:
+        path: directory of the store
+        mode: "r" read only, "r+" read and write
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        self.mode = mode
+
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        self.dates = np.array(meta["dates"], dtype="datetime64[D]")
+        self.codes = pd.Index(meta["codes"])
+        self.fields = list(meta["fields"])
+        self.dtype = np.dtype(meta["dtype"])
+        self._arrays = {}
+
+    # create an empty store (all NaN) on trading days from start date to end date
+    @classmethod
+    def create(cls, path, codes, fields, sdate, edate=None, dtype="float64", calendar=None):
+        """
+        #Func:
+            create an empty store (all NaN) on trading days from start date to end date
+
+        #Params:
+            path: directory of the store, created if not exists
+            codes: Wind codes, e.g: ["000011.OF", "000300.SH"]
+            fields: data fields, e.g: ["NAV_ADJ"]
+            sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+            dtype: "float64" or "float32" (half the size)
+            calendar: TradingCalendar, if None, get_calendar()
+
+        #Return:
+            NavStore opened with mode "r+"
+        """
+
+        calendar = get_calendar() if calendar is None else calendar
+        dates = calendar.range(sdate, edate)
+        fields = [f.upper() for f in ([fields] if isinstance(fields, str) else fields)]
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        for field in fields:
+            arr = np.memmap(os.path.join(path, field + ".bin"), dtype=dtype, mode="w+",
+                            shape=(max(len(dates), 1), max(len(codes), 1)))
+            arr[:] = np.nan
+            arr.flush()
+            del arr
+
+        meta = {"dates":[str(d) for d in dates], "codes":[c.upper() for c in codes],
+                "fields":fields, "dtype":np.dtype(dtype).name}
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        return cls(path, mode="r+")
+
+    # create a store from wind_series output
+    @classmethod
+    def from_frame(cls, path, df, dtype="float64", calendar=None):
+        """
+        #Func:
+            create a store from wind_series output (date index, Wind code + fields columns)
+
+        #Params:
+            path: directory of the store
+            df: pandas DataFrame with hierarchical columns (Wind code, field)
+            dtype: "float64" or "float32"
+            calendar: TradingCalendar, if None, get_calendar()
+
+        #Return:
+            NavStore opened with mode "r+"
+        """
+
+        codes = list(df.columns.get_level_values(0).unique())
+        fields = list(df.columns.get_level_values(1).unique())
+        store = cls.create(path, codes, fields, df.index[0], df.index[-1], dtype, calendar)
+
+        for field in fields:
+            store.write(field, df.xs(field, axis=1, level=1))
+        store.flush()
+
+        return store
+
+    # return the whole date x code array of a field, memory mapped
+    def array(self, field):
+        field = field.upper()
+        if field not in self._arrays:
+            self._arrays[field] = np.memmap(os.path.join(self.path, field + ".bin"), dtype=self.dtype,
+                                            mode=self.mode, shape=(len(self.dates), len(self.codes)))
+
+        return self._arrays[field]
+
+    # return row positions of trading days from start date to end date
+    def rows(self, sdate=None, edate=None):
+        spos = 0 if sdate is None else np.searchsorted(self.dates, np.datetime64(to_date(sdate), "D"), side="left")
+        epos = len(self.dates) if edate is None else \
+            np.searchsorted(self.dates, np.datetime64(to_date(edate), "D"), side="right")
+
+        return slice(int(spos), int(epos))
+
+    # return a field as pandas DataFrame
+    def frame(self, field, codes=None, sdate=None, edate=None):
+        """
+        #Func:
+            return a field as pandas DataFrame, a zero-copy view of the memory mapped
+            array for all codes (selected codes are gathered into a copy)
+
+        #Params:
+            field: data field, e.g: "NAV_ADJ"
+            codes: Wind codes, if None, all codes
+            sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+
+        #Return:
+            pandas DataFrame with date index and Wind code columns
+        """
+
+        rows = self.rows(sdate, edate)
+        values = self.array(field)[rows]
+        cols = self.codes
+
+        if codes is not None:
+            pos = self.codes.get_indexer([c.upper() for c in codes])
+            if np.any(pos < 0):
+                raise KeyError("codes not in store: " + str(list(np.asarray(codes)[pos < 0])))
+            values, cols = values[:, pos], self.codes[pos]
+
+        return pd.DataFrame(values, index=pd.DatetimeIndex(self.dates[rows]), columns=cols, copy=False)
+
+    # write data of a field into store, aligned by date and code
+    def write(self, field, df):
+        """
+        #Func:
+            write data of a field into store, aligned by date and code,
+            dates not in store are ignored
+
+        #Params:
+            field: data field, e.g: "NAV_ADJ"
+            df: pandas DataFrame with date index and Wind code columns
+        """
+
+        arr = self.array(field)
+        days = np.asarray(pd.DatetimeIndex(pd.to_datetime(df.index)).values, dtype="datetime64[D]")
+        rows = np.searchsorted(self.dates, days).clip(0, max(len(self.dates) - 1, 0))
+        keep = self.dates[rows] == days
+        cols = self.codes.get_indexer([str(c).upper() for c in df.columns])
+        if np.any(cols < 0):
+            raise KeyError("codes not in store: " + str(list(df.columns[cols < 0])))
+
+        arr[np.ix_(rows[keep], cols)] = df.values[keep].astype(self.dtype)
+
+    # extend store to trading days until end date
+    def extend(self, edate=None, calendar=None):
+        """
+        #Func:
+            extend store to trading days until end date, new rows are NaN,
+            rows are appended at the end of each file, old rows are not rewritten
+
+        #Params:
+            edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+            calendar: TradingCalendar, if None, get_calendar()
+        """
+
+        calendar = get_calendar() if calendar is None else calendar
+        new = calendar.range(self.dates[-1].item(), edate)[1:]
+        if not len(new):
+            return
+
+        self.flush()
+        self._arrays = {}
+
+        nan_rows = np.full((len(new), len(self.codes)), np.nan, dtype=self.dtype)
+        for field in self.fields:
+            with open(os.path.join(self.path, field + ".bin"), "ab") as f:
+                f.write(nan_rows.tobytes())
+
+        self.dates = np.concatenate([self.dates, new])
+        with open(os.path.join(self.path, "meta.json")) as f:
+            meta = json.load(f)
+        meta["dates"] = [str(d) for d in self.dates]
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    # flush written data to disk
+    def flush(self):
+        for arr in self._arrays.values():
+            if self.mode != "r":
+                arr.flush()
@@ -1,8 +1,18 @@
 import datetime as dt
+import numpy as np
 import pandas as pd
-from WindPy import *
 
-w.start()
+from .instrument import span
+from .providers import get_provider
+
+# first trading day of China A-share market
+calendar_start = "1990-12-19"
+
+# loaded trading calendars, keyed by Wind options (e.g. TradingCalendar="SZSE")
+_calendars = {}
+
+# where trading calendars are loaded from, None means the market data provider
+_calendar_source = None
 
 
 # return today's date
@@ -25,20 +35,350 @@ def to_date(date):
     """
     #Func:
         trans date format from string to datetime.date
-    
+
     #Params:
-        date: date in string format like "2018-03-24"
-    
+        date: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10),
+              datetime.datetime, pd.Timestamp or np.datetime64
+
     #Return:
         date in datetime.date format
     """
-    
+
     if isinstance(date, str):
-        date = dt.datetime.strptime(date, "%Y-%m-%d").date() # YYYY-MM-DD
-        
+        try:
+            date = dt.datetime.strptime(date, "%Y-%m-%d").date() # YYYY-MM-DD
+        except ValueError:
+            date = pd.Timestamp(date).date() # YYYYMMDD, YYYY/MM/DD...
+    elif isinstance(date, (dt.datetime, np.datetime64)):
+        date = pd.Timestamp(date).date()
+
     return date
 
 
+# trading calendar held in memory as a sorted datetime64 array
+class TradingCalendar(object):
+    """
+    #Func:
+        trading calendar held in memory as a sorted datetime64[D] array,
+        every query is a binary search (np.searchsorted) on that array
+
+        every query accepts a single date or an array of dates,
+        a single date gives datetime.date (None if out of calendar),
+        an array gives np.ndarray of datetime64[D] (NaT if out of calendar)
+
+    #Params:
+        dates: trading days in any order, list of dates or array-like
+    """
+
+    def __init__(self, dates):
+        self.dates = np.unique(np.asarray(pd.to_datetime(pd.Index(dates)).values,
+                                          dtype="datetime64[D]"))
+        self._period_ends = {} # period -> positions of period-end trading days
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, date):
+        pos = self.locate(date)
+        return pos is not None and self.dates[pos] == np.datetime64(to_date(date), "D")
+
+    @property
+    def first(self):
+        return self.dates[0].item() if len(self.dates) else None
+
+    @property
+    def last(self):
+        return self.dates[-1].item() if len(self.dates) else None
+
+    # trans date(s) to datetime64[D] array, tell whether input is a single date
+    def _to_days(self, date):
+        if date is None:
+            return np.array([today()], dtype="datetime64[D]"), True
+        if isinstance(date, (str, dt.date, np.datetime64, pd.Timestamp)):
+            return np.array([to_date(date)], dtype="datetime64[D]"), True
+
+        days = np.asarray(pd.to_datetime(pd.Index(date)).values, dtype="datetime64[D]")
+        return days, False
+
+    # trans positions to dates, out of range positions to NaT/None
+    def _to_dates(self, pos, scalar):
+        valid = (pos >= 0) & (pos < len(self.dates))
+        out = np.full(pos.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        out[valid] = self.dates[pos[valid]]
+
+        if scalar:
+            return None if np.isnat(out[0]) else out[0].item()
+        return out
+
+    # return position of previous(most recent) trading day in calendar
+    def locate(self, date=None):
+        """
+        #Func:
+            return position of previous(most recent) trading day in calendar
+
+        #Params:
+            date: a date or an array of dates, if None, today
+
+        #Return:
+            position (int, None if before calendar) or array of positions (-1 if before calendar)
+        """
+
+        days, scalar = self._to_days(date)
+        pos = np.searchsorted(self.dates, days, side="right") - 1
+
+        if scalar:
+            return None if pos[0] < 0 else int(pos[0])
+        return pos
+
+    # return previous(most recent) trading day's date, date itself if a trading day
+    def prev(self, date=None):
+        days, scalar = self._to_days(date)
+        pos = np.searchsorted(self.dates, days, side="right") - 1
+
+        return self._to_dates(pos, scalar)
+
+    # return next trading day's date, date itself if a trading day
+    def next(self, date=None):
+        days, scalar = self._to_days(date)
+        pos = np.searchsorted(self.dates, days, side="left")
+
+        return self._to_dates(pos, scalar)
+
+    # return the nearest trading day's date, e.g: Sat -> Fri, Sun -> Mon
+    def nearest(self, date=None):
+        days, scalar = self._to_days(date)
+        prev_pos = np.searchsorted(self.dates, days, side="right") - 1
+        next_pos = np.searchsorted(self.dates, days, side="left")
+
+        last = len(self.dates) - 1
+        prev_delta = days - self.dates[np.clip(prev_pos, 0, last)]
+        next_delta = self.dates[np.clip(next_pos, 0, last)] - days
+
+        # prev_tdate <- prev_delta -> date <- next_delta -> next_tdate
+        use_prev = (prev_pos >= 0) & ((next_pos > last) | (prev_delta <= next_delta))
+        pos = np.where(use_prev, prev_pos, next_pos)
+
+        return self._to_dates(pos, scalar)
+
+    # return trading day's date from a [offset] of a paticular date
+    def offset(self, offset, date=None):
+        """
+        #Func:
+            return trading day's date from a [offset] of a paticular date
+
+        #Params:
+            offset: int (in trading days) or offset in Wind date macro,
+                    e.g: "-1TD", "-1W", "-2M", "1Q", "-1Y", "-10D"
+            date: a date or an array of dates, if None, today
+
+        #Return:
+            datetime.date or np.ndarray of datetime64[D]
+        """
+
+        days, scalar = self._to_days(date)
+
+        # parsing offset
+        if isinstance(offset, (int, np.integer)):
+            prd, n = "TD", int(offset)
+        elif offset[-2:].upper() == "TD":
+            prd, n = "TD", int(offset[:-2])
+        else:
+            prd, n = offset[-1:].upper(), int(offset[:-1])
+
+        if prd == "TD":
+            # count from the trading day on or before date, as Wind's tdaysoffset:
+            # a trading day +1 is the next trading day, a weekend +1 is the next Monday
+            pos = np.searchsorted(self.dates, days, side="right") - 1 + n
+            return self._to_dates(pos, scalar)
+
+        shifts = {"D": {"days": n}, "W": {"weeks": n}, "M": {"months": n},
+                  "Q": {"months": 3 * n}, "S": {"months": 6 * n}, "Y": {"years": n}}
+        if prd not in shifts:
+            raise ValueError("unknown offset period: " + str(offset))
+
+        shifted = pd.DatetimeIndex(days) + pd.DateOffset(**shifts[prd])
+        pos = np.searchsorted(self.dates, shifted.values.astype("datetime64[D]"), side="right") - 1
+
+        return self._to_dates(pos, scalar)
+
+    # return trading days from start date to end date (both included)
+    def range(self, sdate, edate=None):
+        sday = np.datetime64(to_date(sdate), "D")
+        eday = np.datetime64(today() if edate is None else to_date(edate), "D")
+
+        spos = np.searchsorted(self.dates, sday, side="left")
+        epos = np.searchsorted(self.dates, eday, side="right")
+
+        return self.dates[spos:epos]
+
+    # count how many trading days from start date(s) to end date(s) (both included)
+    def count(self, sdate, edate=None):
+        sdays, scalar = self._to_days(sdate)
+        edays, _ = self._to_days(edate)
+
+        spos = np.searchsorted(self.dates, sdays, side="left")
+        epos = np.searchsorted(self.dates, edays, side="right")
+        counts = np.maximum(epos - spos, 0)
+
+        return int(counts[0]) if scalar and np.ndim(edate) == 0 else counts
+
+    # return period keys of trading days, days of the same period share a key
+    def _period_keys(self, prd):
+        if prd == "d":
+            return self.dates.astype("int64")
+        if prd == "w":
+            # 1970-01-01 is a Thursday, weeks start on Monday
+            return (self.dates.astype("int64") + 3) // 7
+
+        months = self.dates.astype("datetime64[M]").astype("int64")
+        divisors = {"m":1, "q":3, "s":6, "y":12}
+        if prd not in divisors:
+            raise ValueError("unknown period: " + str(prd))
+
+        return months // divisors[prd]
+
+    # return positions of the last trading day of every period in calendar
+    def period_ends(self, prd):
+        """
+        #Func:
+            return positions of the last trading day of every period in calendar,
+            computed once per period and kept with the calendar
+
+        #Params:
+            prd: "d", "w", "m", "q", "s", "y"
+
+        #Return:
+            numpy array of positions
+        """
+
+        if prd not in self._period_ends:
+            keys = self._period_keys(prd)
+            ends = np.flatnonzero(keys[1:] != keys[:-1])
+            self._period_ends[prd] = np.append(ends, len(keys) - 1) if len(keys) else ends
+
+        return self._period_ends[prd]
+
+    # return number of periods in every calendar year
+    def periods_per_year(self, prd):
+        """
+        #Func:
+            return number of periods (e.g: trading days, weeks) in every calendar year,
+            the exact annualization factor of each year
+
+        #Params:
+            prd: "d", "w", "m", "q", "s", "y"
+
+        #Return:
+            pandas Series indexed by year
+        """
+
+        years = self.dates[self.period_ends(prd)].astype("datetime64[Y]").astype("int64") + 1970
+        years, counts = np.unique(years, return_counts=True)
+
+        return pd.Series(counts, index=years, name=prd)
+
+
+# load trading calendar via market data provider (Wind API by default)
+def wind_calendar(sdate=calendar_start, edate=None, **kwargs):
+    """
+    #Func:
+        load trading calendar via market data provider (one round trip)
+
+    #Params:
+        sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+                      if edate is None, the end of next year
+        **kwargs: ref: https://www.windquant.com/
+
+    #Return:
+        TradingCalendar
+    """
+
+    if edate is None:
+        edate = dt.date(today().year + 1, 12, 31)
+
+    with span("provider.tdays", "provider") as args:
+        wind_data = get_provider().tdays(to_date(sdate), to_date(edate), **kwargs)
+        args["rows"] = len(wind_data.Times)
+        args["error_code"] = wind_data.ErrorCode
+
+    if wind_data.ErrorCode != 0:
+        # Error Code: ref: https://www.windquant.com/
+        raise Exception("Wind Error Code:" + str(wind_data.ErrorCode))
+
+    return TradingCalendar(wind_data.Times)
+
+
+# load trading calendar from a local CSV or Parquet file
+def file_calendar(path, column=None, **kwargs):
+    """
+    #Func:
+        load trading calendar from a local CSV or Parquet file, for offline use
+
+    #Params:
+        path: path of a ".csv" or ".parquet" file, one trading day per row
+        column: column of trading days, if None, the first column
+        **kwargs: ignored, Wind options are meaningless for a local file
+
+    #Return:
+        TradingCalendar
+    """
+
+    if str(path).lower().endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+
+    column = df.columns[0] if column is None else column
+
+    return TradingCalendar(df[column])
+
+
+# set where trading calendars are loaded from
+def set_calendar_source(source=None):
+    """
+    #Func:
+        set where trading calendars are loaded from, loaded calendars are dropped
+
+    #Params:
+        source: None for the market data provider, path of a CSV/Parquet file,
+                or a callable taking Wind options and returning a TradingCalendar
+    """
+
+    global _calendar_source
+
+    if isinstance(source, str):
+        path = source
+        source = lambda **kwargs: file_calendar(path)
+
+    _calendar_source = source
+    _calendars.clear()
+
+
+# return trading calendar, loaded once per Wind options
+def get_calendar(**kwargs):
+    """
+    #Func:
+        return trading calendar, loaded once per Wind options and kept in memory
+
+    #Params:
+        **kwargs: ref: https://www.windquant.com/, e.g: TradingCalendar="SZSE"
+
+    #Return:
+        TradingCalendar
+    """
+
+    key = tuple(sorted(kwargs.items()))
+    if _calendar_source is None:
+        # a calendar belongs to the provider it is loaded from
+        key = (id(get_provider()),) + key
+
+    if key not in _calendars:
+        source = wind_calendar if _calendar_source is None else _calendar_source
+        _calendars[key] = source(**kwargs)
+
+    return _calendars[key]
+
+
 # return previous(most recent) trading day's date
 # from today or a paticular date
 def tdays_prev(date=None, **kwargs):
@@ -46,22 +386,17 @@ def tdays_prev(date=None, **kwargs):
     #Func:
         return previous(most recent) trading day's date
         from today or a paticular date
-    
+
     #Params:
         date: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+              or an array of dates
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
-        date in datetime.date format
+        date in datetime.date format (array of datetime64[D] for an array of dates)
     """
-    
-    edate = to_date(date) # end date
-    
-    # ED-0TD is Wind date macro, ref: https://www.windquant.com/
-    # 0 trading day before end date
-    wind_data = w.tdays("ED-0TD", edate, **kwargs)
 
-    return wind_data.Times[0] # datetime.date
+    return get_calendar(**kwargs).prev(date)
 
 
 # return next trading day's date
@@ -71,22 +406,17 @@ def tdays_next(date=None, **kwargs):
     #Func:
         return next trading day's date
         from today or a paticular date
-    
+
     #Params:
         date: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+              or an array of dates
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
-        date in datetime.date format
+        date in datetime.date format (array of datetime64[D] for an array of dates)
     """
-    
-    sdate = to_date(date) # start date
-    
-    # SD+1TD is Wind date macro, ref: https://www.windquant.com/
-    # 1 trading day after start date
-    wind_data = w.tdays(sdate, "SD+1TD", **kwargs)
-    
-    return wind_data.Times[0] # datetime.date
+
+    return get_calendar(**kwargs).next(date)
 
 
 # return previous(most recent) trading day's date
@@ -96,32 +426,19 @@ def tdays_offset(offset, date, **kwargs):
     #Func:
         return previous(most recent) trading day's date
         from a [offset] of a paticular date
-    
+
     #Params:
         offset: offset in Wind date macro, e.g: "-1W", "-2M"
         date: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+              or an array of dates
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
-        date in datetime.date format
+        date in datetime.date format (array of datetime64[D] for an array of dates)
     """
-    
-    # parsing offset
-    if offset[-2:].upper() == "TD":
-        prd = "TD"  # trading day
-        offset = int(offset[:-2])
-    else:
-        prd = offset[-1:].upper()
-        offset = int(offset[:-1])
-    
-    date = to_date(date)
-    options = ";".join([k + "=" + v for k, v in kwargs.items()])
-    options = options + ";period=" + prd
-    
-    wind_data = w.tdaysoffset(offset, date, options)
-    
-    return wind_data.Times[0] # datetime.date
-    
+
+    return get_calendar(**kwargs).offset(offset, date)
+
 
 # return the nearest trading day's date
 # e.g: Sat -> Fri, Sun -> Mon
@@ -130,30 +447,17 @@ def tdays_nearest(date=None, **kwargs):
     #Func:
         return the nearest trading day's date
         e.g: Sat -> Fri, Sun -> Mon
-    
+
     #Params:
         date: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+              or an array of dates
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
-        date in datetime.date format
+        date in datetime.date format (array of datetime64[D] for an array of dates)
     """
-    
-    date = today() if date is None else to_date(date) # if None, today
-    
-    prev_tdate = tdays_prev(date, **kwargs)
-    next_tdate = tdays_next(date, **kwargs)
-
-    # prev_tdate <- prev_delta -> date <- next_delta -> next_tdate
-    prev_delta = date - prev_tdate
-    next_delta = next_tdate - date
-    
-    if prev_delta.days == next_delta.days == 1:
-        return date
-    elif prev_delta <= next_delta:
-        return prev_tdate
-    else:
-        return next_tdate
+
+    return get_calendar(**kwargs).nearest(date)
 
 
 # return a date series of trading day from start date to end date
@@ -161,38 +465,36 @@ def tdays_series(sdate, edate=None, **kwargs):
     """
     #Func:
         return a date series of trading day from start date to end date
-    
+
     #Params:
         sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
         date series in pandas Series
     """
-    
-    sdate = to_date(sdate) # start date
-    edate = today() if edate is None else to_date(edate) # end date, if None, today
-    
-    wsd_data = w.tdays(sdate, edate, **kwargs)
-    
-    if wsd_data.Data:
-        return pd.Series(wsd_data.Data[0], index=wsd_data.Times)
+
+    dates = get_calendar(**kwargs).range(sdate, edate).astype(object) # datetime.date
+
+    if len(dates):
+        return pd.Series(dates, index=dates)
     else:
         return None
 
-    
+
 # count how many trading days from start date to end date
 def tdays_count(sdate, edate=None, **kwargs):
     """
     #Func:
         count how many trading days from start date to end date
-    
+
     #Params:
         sdate, edate: e.g: "20181010", "2018/10/10", "2018-10-10", datetime.date(2018, 10, 10)
+                      or arrays of dates
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
-        a number
+        a number (array of numbers for arrays of dates)
     """
-    
-    return len(tdays_series(sdate, edate=None, **kwargs))
+
+    return get_calendar(**kwargs).count(sdate, edate)
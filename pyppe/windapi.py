@@ -1,29 +1,205 @@
+import threading
+import time
+import numpy as np
 import pandas as pd
-from WindPy import *
+from concurrent.futures import ThreadPoolExecutor
 
-from .tdays import tdays_prev, to_date
+from .cache import fields_list, numeric_data
+from .instrument import clock, record, span, timed
+from .providers import get_provider
+from .tdays import get_calendar, tdays_prev, to_date
+
+
+# error returned by Wind API
+class WindError(Exception):
+    """
+    #Func:
+        error returned by Wind API
+
+    #Params:
+        code: Wind error code, ref: https://www.windquant.com/
+    """
+
+    def __init__(self, code):
+        self.code = code
+        super(WindError, self).__init__("Wind Error Code:" + str(code))
+
+
+# Wind error codes of transient failures worth a retry: timeout, network timeout, quota exceeded
+transient_errors = (-40520008, -40521010, -40522017)
+
+
+# limit how many requests are sent per second, shared by threads
+class RateLimiter(object):
+    """
+    #Func:
+        limit how many requests are sent per second, shared by threads
+
+    #Params:
+        rate: max requests per second, if None, no limit
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 0.0 if not rate else 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    # block until next request is allowed
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+
+        if slot > now:
+            start = clock()
+            time.sleep(slot - now)
+            record("windapi.rate_wait", "provider", start)
+
+
+# fetch time series data of one code via Wind API
+def wind_wsd(code, fields, sdate, edate, **kwargs):
+    """
+    #Func:
+        fetch time series data of one code via Wind API
+
+    #Params:
+        code: Wind code, e.g: "000300.SH"
+        fields: data field, e.g: "close", ["high", "low"]
+        sdate, edate: e.g: datetime.date(2018, 10, 10)
+        **kwargs: ref: https://www.windquant.com/
+
+    #Return:
+        raw Wind data
+    """
+
+    with span("provider.wsd", "provider", code=code) as args:
+        wind_data = get_provider().wsd(code, fields, sdate, edate, **kwargs) # raw wind data
+        args["rows"] = len(wind_data.Times)
+        args["error_code"] = wind_data.ErrorCode
+
+    if wind_data.ErrorCode != 0:
+        # Error Code: ref: https://www.windquant.com/
+        raise WindError(wind_data.ErrorCode)
+
+    return wind_data
+
+
+# return a wind_wsd with rate limiting and retry/backoff on Wind errors
+def retrying_wsd(limiter=None, retries=3, backoff=1.0, retry_codes=None):
+    """
+    #Func:
+        return a wind_wsd with rate limiting and retry/backoff on Wind errors
+
+    #Params:
+        limiter: RateLimiter shared by all requests, if None, no limit
+        retries: max retries of one request
+        backoff: seconds to wait before first retry, doubled for every next retry
+        retry_codes: Wind error codes worth a retry, if None, any error code
+
+    #Return:
+        function with the same parameters as wind_wsd
+    """
+
+    def wsd(code, fields, sdate, edate, **kwargs):
+        for attempt in range(retries + 1):
+            if limiter is not None:
+                limiter.wait()
+            try:
+                return wind_wsd(code, fields, sdate, edate, **kwargs)
+            except WindError as e:
+                if attempt == retries or (retry_codes is not None and e.code not in retry_codes):
+                    raise
+                start = clock()
+                time.sleep(backoff * 2 ** attempt)
+                record("windapi.retry_backoff", "provider", start, code=code, error_code=e.code)
+
+    return wsd
+
+
+# trans raw Wind data to dates and values (dates x fields), object values for text fields
+def _wind_values(wind_data, num_fields):
+    times = np.array(wind_data.Times, dtype="datetime64[D]")
+    dtype = float if numeric_data(wind_data.Data) else object
+    values = np.array(wind_data.Data, dtype=dtype).reshape(num_fields, len(times)).T
+
+    return times, values
+
+
+# fetch time series data of one code, only the segments missing in cache via Wind API
+def cached_wsd(cache, code, fields, sdate, edate, wsd=wind_wsd, **kwargs):
+    """
+    #Func:
+        fetch time series data of one code,
+        only the trading day segments missing in cache via Wind API
+
+    #Params:
+        cache: SeriesCache, fields with text values (e.g: trade_status) are fetched without it
+        code: Wind code, e.g: "000011.OF"
+        fields: data field, e.g: "NAV", ["NAV", "NAV_adj"]
+        sdate, edate: e.g: datetime.date(2018, 10, 10)
+        wsd: function fetching one code, e.g: wind_wsd
+        **kwargs: ref: https://www.windquant.com/
+
+    #Return:
+        pandas DataFrame with date index and upper case field columns
+    """
+
+    fields = fields_list(fields)
+
+    # series are pinned, so stores (of this or other threads) do not evict them before load
+    with cache.pin(code, fields, **kwargs):
+        # union of missing segments over all fields
+        gaps = set()
+        for field in fields:
+            gaps.update(cache.missing(code, field, sdate, edate, **kwargs))
+
+        for gap_sdate, gap_edate in sorted(gaps):
+            wind_data = wsd(code, fields, gap_sdate, gap_edate, **kwargs)
+            if not numeric_data(wind_data.Data):
+                # text fields (e.g: trade_status) bypass the cache, the whole range fetched directly
+                if (gap_sdate, gap_edate) != (to_date(sdate), to_date(edate)):
+                    wind_data = wsd(code, fields, sdate, edate, **kwargs)
+                times, values = _wind_values(wind_data, len(fields))
+                return pd.DataFrame(values, index=times.astype(object), columns=fields)
+            cache.store(code, fields, wind_data.Times, wind_data.Data, gap_sdate, gap_edate, **kwargs)
+
+        return cache.load(code, fields, sdate, edate, **kwargs)
 
-w.start()
 
 # fetch time series data via Wind API
-def wind_series(wcodes, fields, sdate, edate, **kwargs):
+@timed("windapi.wind_series", "windapi")
+def wind_series(wcodes, fields, sdate, edate, cache=None,
+                workers=None, rate=None, retries=0, backoff=1.0, retry_codes=transient_errors, **kwargs):
     """
     #Func:
         fetch time series data via Wind API
         multi-codes with multi-indicators is supported
-    
+
     #Params:
         wcodes: Wind code, e.g: "000300.SH", "000011.of", ["000300.SH", "000985.CSI"]
-        fields: data field, e.g: "close", "NAV", "nav_adj", ["high", "low"]
+        fields: data field, e.g: "close", "NAV", "nav_adj", ["high", "low"], ["close", "trade_status"]
         sdate: start date, e.g: "20180710", "2018/07/01", "2018-07-10", datetime.date(2018, 07, 10)
         edate: end date, e.g: "20181015", "2018/10/15", "2018-10-15", datetime.date(2018, 10, 15)
+        cache: SeriesCache, if given, only data missing in cache is fetched via Wind API
+               (codes with text fields, e.g: trade_status, are fetched without it)
+        workers: number of threads fetching codes concurrently, if None, one by one
+        rate: max Wind requests per second, if None, no limit
+        retries: max retries of a request failed with Wind error code
+        backoff: seconds to wait before first retry, doubled for every next retry
+        retry_codes: Wind error codes worth a retry, e.g: transient_errors (timeout, network, quota),
+                     other errors (e.g: no data of an unknown code) are raised at once,
+                     if None, any error code
         **kwargs: ref: https://www.windquant.com/
-    
+
     #Return:
         time series data in pandas DataFrame
         with date index and Wind code + fields columns (hierarchical columns)
     """
-    
+
     sdate = tdays_prev(to_date(sdate), **kwargs) # most recent trading day of start date
     edate = tdays_prev(to_date(edate), **kwargs) # most recent trading day of end date
 
@@ -32,27 +208,41 @@ def wind_series(wcodes, fields, sdate, edate, **kwargs):
         # wcodes is a list of one Wind code like ["000300.SH"]
         wcodes = [wcodes]
 
-    if isinstance(fields, list):
-        # fields is a list like ["high", "low"]
-        fields_len = len(fields)
+    fields = fields_list(fields) # like ["HIGH", "LOW"]
+    wsd = retrying_wsd(RateLimiter(rate), retries, backoff, retry_codes)
+
+    # fetch one code, return (dates, values in dates x fields)
+    def fetch(code):
+        if cache is not None:
+            sub_df = cached_wsd(cache, code, fields, sdate, edate, wsd=wsd, **kwargs)
+            return sub_df.index.values.astype("datetime64[D]"), sub_df.values
+
+        return _wind_values(wsd(code, fields, sdate, edate, **kwargs), len(fields))
+
+    if workers is None:
+        results = [fetch(code) for code in wcodes]
     else:
-        # fields is a string like "high"
-        fields_len = 1
-
-    df = pd.DataFrame()
-    
-    for code in wcodes:
-        wind_data = w.wsd(code, fields, sdate, edate, **kwargs) # raw wind data
-        
-        if wind_data.ErrorCode != 0:
-            # Error Code: ref: https://www.windquant.com/
-            raise Exception("Wind Error Code:" + str(wind_data.ErrorCode))
-        
-        wcodes_col = [code.upper()] * fields_len # like ["000300.SH", "000300.SH"]
-
-        idx = pd.MultiIndex.from_arrays([wcodes_col, wind_data.Fields])
-        sub_df = pd.DataFrame(wind_data.Data, index=idx, columns=wind_data.Times).T
-        
-        df = pd.concat([df, sub_df], axis=1)
-
-    return df
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fetch, wcodes))
+
+    # trading days as index, or union of returned dates if they are not all trading days
+    dates = get_calendar(**kwargs).range(sdate, edate)
+    for times, _ in results:
+        pos = np.searchsorted(dates, times).clip(0, max(len(dates) - 1, 0))
+        if len(times) and (not len(dates) or np.any(dates[pos] != times)):
+            dates = np.unique(np.concatenate([times for times, _ in results]))
+            break
+
+    # one pre-sized block, filled code by code, an object block if a field is text (e.g: trade_status)
+    num_fields = len(fields)
+    dtype = object if any(values.dtype == object for _, values in results) else float
+    block = np.full((len(dates), len(wcodes) * num_fields), np.nan, dtype=dtype)
+    for i, (times, values) in enumerate(results):
+        block[np.searchsorted(dates, times), i * num_fields:(i + 1) * num_fields] = values
+
+    wcodes_col = np.repeat([code.upper() for code in wcodes], num_fields) # like ["000300.SH", "000300.SH"]
+    idx = pd.MultiIndex.from_arrays([wcodes_col, fields * len(wcodes)])
+
+    df = pd.DataFrame(block, index=dates.astype(object), columns=idx)
+
+    return df.infer_objects() if dtype is object else df
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyppe import tdays
+from pyppe.cache import SeriesCache
+from pyppe.providers import FakeProvider, set_provider
+from pyppe.windapi import wind_series
+
+days = pd.bdate_range("2018-01-01", "2018-12-31")
+
+
+@pytest.fixture
+def provider():
+    navs = {"F%d.OF" % i:pd.DataFrame({"NAV":1 + 0.001 * np.arange(len(days)) + i}, index=days)
+            for i in range(4)}
+    provider = FakeProvider(navs, latency=0.01)
+    set_provider(provider)
+    tdays.set_calendar_source(None)
+    yield provider
+    set_provider(None)
+    tdays.set_calendar_source(None)
+
+
+def test_cache_hit(provider, tmp_path):
+    cache = SeriesCache(str(tmp_path / "cache.db"))
+    first = wind_series(["F0.OF", "F1.OF"], "NAV", "2018-03-01", "2018-06-29", cache=cache)
+    calls = provider.calls
+    second = wind_series(["F0.OF", "F1.OF"], "NAV", "2018-03-01", "2018-06-29", cache=cache)
+
+    assert provider.calls == calls
+    pd.testing.assert_frame_equal(first, second)
+
+
+# a series larger than the size limit is evicted only after it is loaded
+def test_evict_larger_than_limit(provider, tmp_path):
+    cache = SeriesCache(str(tmp_path / "cache.db"), max_rows=50)
+    df = wind_series(["F0.OF", "F1.OF"], "NAV", "2018-03-01", "2018-06-29", cache=cache)
+
+    assert len(df) == 87
+    assert not df.isna().any().any()
+    assert cache.size() <= 50
+
+
+# concurrent stores do not evict series other threads have not loaded yet
+@pytest.mark.parametrize("workers", [None, 4])
+def test_evict_with_workers(provider, tmp_path, workers):
+    cache = SeriesCache(str(tmp_path / "cache.db"), max_rows=300)
+    codes = ["F%d.OF" % i for i in range(4)]
+    df = wind_series(codes, "NAV", "2018-01-01", "2018-12-31", cache=cache, workers=workers)
+
+    assert df.shape == (len(days), 4)
+    assert not df.isna().any().any()
+    np.testing.assert_allclose(df[("F3.OF", "NAV")].values, 4 + 0.001 * np.arange(len(days)))
+    assert cache.size() <= 300
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyppe.covariance import ewma_cov, ledoit_wolf
+from pyppe.portfolio import risk_contrib
+
+
+def ragged_rets(num=60, length=500, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (length, 3))
+    x = factors.dot(rng.normal(1, 0.3, (3, num))) * 0.5 + rng.normal(0, 0.01, (length, num))
+    for j, start in enumerate(rng.integers(0, length - 10, num)):
+        x[:start, j] = np.nan
+
+    return pd.DataFrame(x, index=pd.bdate_range("2018-01-01", periods=length))
+
+
+def test_ledoit_wolf_full_data():
+    rng = np.random.default_rng(1)
+    x = rng.normal(0, 0.01, (300, 8)).dot(np.eye(8) + 0.3)
+    xc = x - x.mean(axis=0)
+    s = xc.T.dot(xc) / len(x)
+    mu = np.trace(s) / 8
+    d2 = ((s - mu * np.eye(8)) ** 2).sum() / 8
+    b2 = min(sum(((np.outer(r, r) - s) ** 2).sum() for r in xc) / len(x) ** 2 / 8, d2)
+    expected = b2 / d2 * mu * np.eye(8) + (1 - b2 / d2) * s
+
+    np.testing.assert_allclose(ledoit_wolf(x), expected, atol=1e-15)
+
+
+# pairwise moments of short overlapping histories are projected to PSD
+@pytest.mark.parametrize("estimate", [lambda x: ledoit_wolf(x, min_periods=2), ledoit_wolf,
+                                      lambda x: ewma_cov(x, min_periods=2), ewma_cov])
+def test_psd_on_ragged(estimate):
+    c = estimate(ragged_rets()).values
+    ok = np.isfinite(np.diag(c))
+    sub = c[np.ix_(ok, ok)]
+    vals, vecs = np.linalg.eigh(sub)
+
+    assert vals.min() > -1e-12 * np.diag(sub).mean()
+    assert not np.isnan(risk_contrib(vecs[:, 0] ** 2, sub)).any()
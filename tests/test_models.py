@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyppe import tdays
+from pyppe.models import StyleData
+from pyppe.providers import FakeProvider, set_provider
+
+days = pd.bdate_range("2018-01-01", "2018-06-29")
+
+
+@pytest.fixture
+def provider():
+    data = {code:pd.DataFrame({"CLOSE":(1 + 0.001 * (i + 1)) ** np.arange(len(days))}, index=days)
+            for i, code in enumerate(["S1.WI", "S2.WI", "S3.WI"])}
+    provider = FakeProvider(data)
+    set_provider(provider)
+    tdays.set_calendar_source(None)
+    yield provider
+    set_provider(None)
+    tdays.set_calendar_source(None)
+
+
+# suite names are resolved in the suites given to StyleData
+def test_style_data_suites(provider):
+    data = StyleData("2018-01-02", "2018-06-29", suites={"s":["S1.WI", "S3.WI"], "t":["S2.WI"]})
+    calls = provider.calls
+
+    frame = data.frame("s")
+    assert list(frame.columns) == ["S1.WI", "S3.WI"]
+    np.testing.assert_allclose(frame.values, [[0.001, 0.003]] * len(frame))
+
+    aligned = data.align("t", days[10:20])
+    np.testing.assert_allclose(aligned.values, 0.002)
+    np.testing.assert_array_equal(data.matrix("s"), data.matrix(["S1.WI", "S3.WI"]))
+    assert provider.calls == calls
+
+    with pytest.raises(KeyError):
+        data.frame("cni_cgv_6") # a suite of style_suites not loaded
@@ -0,0 +1,51 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyppe.tdays import TradingCalendar
+
+# weekdays of Sep-Oct 2018 without the National Day holiday (Oct 1-5)
+holidays = pd.date_range("2018-10-01", "2018-10-05")
+calendar = TradingCalendar(pd.bdate_range("2018-09-01", "2018-10-31").difference(holidays))
+
+
+def d(s):
+    return datetime.datetime.strptime(s, "%Y-%m-%d").date()
+
+
+@pytest.mark.parametrize("date, n, expected", [
+    # from a trading day (Wed)
+    ("2018-10-10", 1, "2018-10-11"),
+    ("2018-10-10", 2, "2018-10-12"),
+    ("2018-10-10", -1, "2018-10-09"),
+    ("2018-10-10", -2, "2018-10-08"),
+    ("2018-10-10", 0, "2018-10-10"),
+    # from a weekend (Sat)
+    ("2018-10-13", 1, "2018-10-15"),
+    ("2018-10-13", 2, "2018-10-16"),
+    ("2018-10-13", -1, "2018-10-11"),
+    ("2018-10-13", -2, "2018-10-10"),
+    ("2018-10-13", 0, "2018-10-12"),
+    # from a holiday (Wed, National Day)
+    ("2018-10-03", 1, "2018-10-08"),
+    ("2018-10-03", 2, "2018-10-09"),
+    ("2018-10-03", -1, "2018-09-27"),
+    ("2018-10-03", -2, "2018-09-26"),
+])
+def test_offset_tdays(date, n, expected):
+    assert calendar.offset(n, date) == d(expected)
+    assert calendar.offset("%dTD" % n, date) == d(expected)
+
+
+def test_offset_array():
+    dates = ["2018-10-10", "2018-10-13", "2018-10-03"]
+    expected = np.array(["2018-10-11", "2018-10-15", "2018-10-08"], dtype="datetime64[D]")
+
+    assert (calendar.offset(1, dates) == expected).all()
+
+
+def test_offset_out_of_calendar():
+    assert calendar.offset(1, "2018-10-31") is None
+    assert calendar.offset(-1, "2018-09-03") is None
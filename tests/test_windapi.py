@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pyppe import tdays
+from pyppe.cache import SeriesCache
+from pyppe.providers import FakeProvider, set_provider
+from pyppe.windapi import WindError, wind_series
+
+days = pd.bdate_range("2018-01-01", "2018-03-30")
+
+
+@pytest.fixture
+def provider():
+    status = np.where(np.arange(len(days)) % 10 == 0, "停牌", "交易")
+    data = {"A.SH":pd.DataFrame({"CLOSE":10 + 0.1 * np.arange(len(days)), "TRADE_STATUS":status}, index=days),
+            "B.SH":pd.DataFrame({"CLOSE":20 + 0.1 * np.arange(len(days))}, index=days)}
+    provider = FakeProvider(data)
+    set_provider(provider)
+    tdays.set_calendar_source(None)
+    yield provider
+    set_provider(None)
+    tdays.set_calendar_source(None)
+
+
+def test_numeric_fields(provider):
+    df = wind_series(["A.SH", "B.SH"], "close", "2018-01-01", "2018-03-30")
+
+    assert df.shape == (len(days), 2)
+    assert (df.dtypes == float).all()
+
+
+# text fields are kept as objects, numeric columns stay float
+@pytest.mark.parametrize("cached", [False, True])
+def test_text_fields(provider, tmp_path, cached):
+    cache = SeriesCache(str(tmp_path / "cache.db")) if cached else None
+    for _ in range(2):
+        df = wind_series(["A.SH", "B.SH"], ["close", "trade_status"], "2018-01-01", "2018-03-30", cache=cache)
+
+        assert df[("A.SH", "TRADE_STATUS")].iloc[0] == "停牌"
+        assert df[("A.SH", "TRADE_STATUS")].iloc[1] == "交易"
+        assert df[("A.SH", "CLOSE")].dtype == float
+        np.testing.assert_allclose(df[("B.SH", "CLOSE")].values, 20 + 0.1 * np.arange(len(days)))
+
+
+def test_cache_rejects_text(tmp_path, provider):
+    cache = SeriesCache(str(tmp_path / "cache.db"))
+    with pytest.raises(TypeError):
+        cache.store("A.SH", ["TRADE_STATUS"], [days[0].date()], [["交易"]], days[0].date(), days[0].date())
+
+
+def test_unknown_code_not_retried(provider):
+    with pytest.raises(WindError):
+        wind_series("X.SH", "close", "2018-01-01", "2018-03-30", retries=2, backoff=10)